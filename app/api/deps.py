@@ -1,16 +1,141 @@
-from typing import Annotated, Dict, Any
+import asyncio
+import hashlib
+import math
+import time
+from typing import Annotated, Dict, Any, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from app.services import auth
 from app.services.http_client import OrientatiException, HttpCodes
+from app.services.redis_service import AsyncRedisSingleton
+from app.services.response_cache import single_flight
+from app.core.config import settings
 from app.core.logging import get_logger
 
 logger = get_logger(__name__)
 
 reusable_oauth2 = OAuth2PasswordBearer(
-    tokenUrl="/api/v1/auth/login"
+    tokenUrl="/api/v1/auth/login/form"
 )
 
+# Cache a due livelli dei payload già verificati:
+# L1 in-process (hash del token -> (payload, scadenza monotonic)) davanti a L2 su Redis, condivisa tra i worker
+_TOKEN_CACHE: Dict[bytes, Tuple[Dict[str, Any], float]] = {}
+_TOKEN_CACHE_MAX_SIZE = 1_000
+# Verifiche in corso: le richieste concorrenti con lo stesso token attendono la stessa future
+_INFLIGHT: Dict[bytes, asyncio.Future] = {}
+
+
+def _token_key(token: str) -> bytes:
+    return hashlib.blake2b(token.encode(), digest_size=16).digest()
+
+
+def _get_cached_payload(key: bytes) -> Dict[str, Any] | None:
+    entry = _TOKEN_CACHE.get(key)
+    if entry is None:
+        return None
+    payload, expires_at = entry
+    if expires_at <= time.monotonic():
+        # Pulizia lazy delle voci scadute
+        _TOKEN_CACHE.pop(key, None)
+        return None
+    return payload
+
+
+# Risposta per i token di sessioni o utenti revocati: validate_token la tratta come token non valido
+_REVOKED_PAYLOAD: Dict[str, Any] = {"verified": False, "expired": False}
+
+
+async def _is_revoked(redis_instance: AsyncRedisSingleton, payload: Dict[str, Any]) -> bool | None:
+    """Controlla su Redis la revoca della sessione o dell'utente del payload (None se non verificabile)."""
+    return await redis_instance.is_token_revoked(payload.get("session_id"), payload.get("user_id"),
+                                                 payload.get("iat"))
+
+
+def _cache_expiry(payload: Dict[str, Any]) -> float:
+    """Istante (epoch) fino a cui il payload può restare in cache."""
+    expires_at = time.time() + settings.TOKEN_CACHE_TTL_SECONDS
+    exp = payload.get("exp")
+    if isinstance(exp, (int, float)):
+        # Non teniamo in cache il payload oltre la scadenza del JWT stesso
+        expires_at = min(expires_at, exp)
+    return expires_at
+
+
+def _cache_payload(key: bytes, payload: Dict[str, Any], expires_at: float) -> None:
+    # La revoca delle sessioni pulisce solo la cache su Redis: la copia locale dura poco
+    ttl = min(expires_at - time.time(), settings.TOKEN_LOCAL_CACHE_TTL_SECONDS)
+    if ttl <= 0:
+        return
+    now = time.monotonic()
+    if len(_TOKEN_CACHE) >= _TOKEN_CACHE_MAX_SIZE:
+        for k in [k for k, (_, entry_expires_at) in _TOKEN_CACHE.items() if entry_expires_at <= now]:
+            del _TOKEN_CACHE[k]
+        if len(_TOKEN_CACHE) >= _TOKEN_CACHE_MAX_SIZE:
+            # Cache piena di voci ancora valide: scartiamo la più vecchia
+            del _TOKEN_CACHE[next(iter(_TOKEN_CACHE))]
+    _TOKEN_CACHE[key] = (payload, now + ttl)
+
+
+async def _load_payload(key: bytes, token: str) -> Dict[str, Any]:
+    """Verifica il token localmente se possibile, altrimenti recupera il payload dalla cache condivisa
+    su Redis o, in mancanza, dal servizio di autenticazione. In tutti i casi un payload valido viene
+    accettato solo se sessione e utente non sono stati revocati (logout, sessione bloccata, kill switch)."""
+    redis_instance = AsyncRedisSingleton()
+
+    payload = await auth.verify_token_locally(token)
+    if payload is not None:
+        revoked = await _is_revoked(redis_instance, payload)
+        if revoked is None:
+            # Stato di revoca sconosciuto (Redis non disponibile): niente scorciatoia, decide il servizio token
+            payload = None
+        elif revoked:
+            return dict(_REVOKED_PAYLOAD)
+        else:
+            _cache_payload(key, payload, _cache_expiry(payload))
+            return payload
+
+    shared = await redis_instance.get_token_payload(key.hex())
+    if shared is not None:
+        if await _is_revoked(redis_instance, shared["payload"]):
+            return dict(_REVOKED_PAYLOAD)
+        _cache_payload(key, shared["payload"], shared["expires_at"])
+        return shared["payload"]
+
+    payload = await auth.verify_token(token)
+    if payload and payload.get("verified") and not payload.get("expired"):
+        if await _is_revoked(redis_instance, payload):
+            return dict(_REVOKED_PAYLOAD)
+        expires_at = _cache_expiry(payload)
+        ttl = math.ceil(expires_at - time.time())
+        if ttl > 0:
+            _cache_payload(key, payload, expires_at)
+            await redis_instance.set_token_payload(key.hex(), {"payload": payload, "expires_at": expires_at}, ttl,
+                                                   user_id=payload.get("user_id"))
+    return payload
+
+
+async def get_verified_payload(token: str) -> Dict[str, Any]:
+    """Restituisce il payload del token dalla cache (locale, poi Redis) o, in mancanza, dal servizio token.
+    I payload non verificati o scaduti non vengono mai messi in cache."""
+    key = _token_key(token)
+    cached = _get_cached_payload(key)
+    if cached is not None:
+        return cached
+    # Single-flight: le richieste concorrenti con lo stesso token condividono una sola verifica
+    return await single_flight(_INFLIGHT, key, lambda: _load_payload(key, token))
+
+
+async def invalidate_cached_token(*tokens: str) -> None:
+    """Rimuove dalla cache (locale e condivisa) i payload associati ai token (es. dopo il logout
+    o quando una sessione viene bloccata)."""
+    keys = [_token_key(token) for token in tokens]
+    for key in keys:
+        _TOKEN_CACHE.pop(key, None)
+    if keys:
+        await AsyncRedisSingleton().delete_token_payload(*(key.hex() for key in keys))
+
+
 async def validate_token(token: Annotated[str, Depends(reusable_oauth2)]) -> Dict[str, Any]:
     """
     Centralized token validation dependency.
@@ -18,23 +143,23 @@ async def validate_token(token: Annotated[str, Depends(reusable_oauth2)]) -> Dic
     Returns the token payload if valid.
     """
     try:
-        payload = await auth.verify_token(token)
+        payload = await get_verified_payload(token)
         
         # Additional Security Checks can be added here
         # e.g., checking specific claims, although verify_token should handle most.
         if not payload or not payload.get("verified"):
-             logger.warning(f"Token validation failed: payload={payload}")
+             logger.warning("Token validation failed: payload=%r", payload)
              raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Could not validate credentials",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-            
+
         return payload
 
     except OrientatiException as e:
         # Log the specific underlying error for internal auditing but return standard 401/403
-        logger.warning(f"Token verification exception: {str(e)}")
+        logger.warning("Token verification exception: %s", e)
         
         # If the service explicitly returned 401 or 403, we respect that.
         # Otherwise, if it was a connection error or 500 from auth service, 
@@ -62,7 +187,7 @@ async def validate_token(token: Annotated[str, Depends(reusable_oauth2)]) -> Dic
             headers={"WWW-Authenticate": "Bearer"},
         )
     except Exception as e:
-        logger.error(f"Unexpected error during token validation: {e}")
+        logger.error("Unexpected error during token validation: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Could not validate credentials",
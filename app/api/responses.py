@@ -0,0 +1,31 @@
+import hashlib
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+# no-cache: il client può conservare la risposta ma deve sempre rivalidarla con If-None-Match,
+# così le invalidazioni della cache lato gateway restano visibili subito
+ETAG_CACHE_CONTROL = "private, no-cache"
+
+
+def etag_response(request: Request, model: BaseModel) -> Response:
+    """
+    Serializza il modello e risponde 304 se il client ha già la stessa rappresentazione.
+
+    Args:
+        request (Request): Richiesta corrente, da cui leggere If-None-Match.
+        model (BaseModel): Risposta già validata da inviare.
+
+    Returns:
+        Response: 304 senza corpo se l'ETag coincide, altrimenti 200 con il JSON e l'ETag.
+    """
+    body = model.model_dump_json().encode()
+    etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": ETAG_CACHE_CONTROL}
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in (
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(","))):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
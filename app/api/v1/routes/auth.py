@@ -1,101 +1,62 @@
 from fastapi import APIRouter, HTTPException, Depends, Request
-from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import Optional
 from pydantic import ValidationError
-from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.deps import get_verified_payload, invalidate_cached_token
 from app.core.logging import get_logger
-from app.core.limiter import limiter
+from app.core.limiter import limiter, SESSION_LIMIT, SENSITIVE_LIMIT
 from app.db.session import get_db
 from app.schemas.auth import UserLogin, TokenResponse, TokenRequest, UserRegistration, UserLogout
-from app.db.session import get_db
 from app.services import auth
-from app.services.http_client import OrientatiException
 
 logger = get_logger(__name__)
 router = APIRouter()
 
 
 @router.post("/login", response_model=TokenResponse)
-@limiter.limit("5/minute")
-async def login(
+@limiter.limit(SENSITIVE_LIMIT)
+async def login(request: Request, user: UserLogin, db: AsyncSession = Depends(get_db)):
+    return await auth.login(user, db)
+
+
+@router.post("/login/form", response_model=TokenResponse)
+@limiter.limit(SENSITIVE_LIMIT)
+async def login_form(
     request: Request,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    user_json: Optional[UserLogin] = None,
     db: AsyncSession = Depends(get_db)
 ):
+    """
+    Login tramite form data, usato dalla Swagger UI (tokenUrl di OAuth2PasswordBearer).
+    """
     try:
-        if form_data:
-            # Swagger UI invia username e password come form data
-            try:
-                user = UserLogin(email=form_data.username, password=form_data.password)
-            except ValidationError as e:
-                # Se la validazione fallisce, solleva un'eccezione 422
-                raise HTTPException(status_code=422, detail=e.errors())
-        elif user_json:
-            user = user_json
-        else:
-             raise HTTPException(status_code=400, detail="Missing credentials")
-             
-        return await auth.login(user, db)
-    except OrientatiException as e:
-        return JSONResponse(
-            status_code=e.status_code,
-            content={
-                "message": e.message,
-                "details": e.details,
-                "url": e.url
-            }
-        )
+        user = UserLogin(email=form_data.username, password=form_data.password)
+    except ValidationError as e:
+        # Se la validazione fallisce, solleva un'eccezione 422
+        raise HTTPException(status_code=422, detail=e.errors())
+
+    return await auth.login(user, db)
 
 
 @router.post("/refresh", response_model=TokenResponse)
-@limiter.limit("20/minute")
+@limiter.limit(SESSION_LIMIT)
 async def post_refresh_token(request: Request, refresh_token: TokenRequest, db: AsyncSession = Depends(get_db)):
-    try:
-        return await auth.refresh_token(refresh_token, db)
-    except OrientatiException as e:
-        return JSONResponse(
-            status_code=e.status_code,
-            content={
-                "message": e.message,
-                "details": e.details,
-                "url": e.url
-            }
-        )
+    return await auth.refresh_token(refresh_token, db)
 
 
 @router.post("/logout", response_model=UserLogout)
-@limiter.limit("20/minute")
+@limiter.limit(SESSION_LIMIT)
 async def logout(request: Request, access_token: TokenRequest, db: AsyncSession = Depends(get_db)):
-    try:
-        return await auth.logout(access_token, db)
-    except OrientatiException as e:
-        return JSONResponse(
-            status_code=e.status_code,
-            content={
-                "message": e.message,
-                "details": e.details,
-                "url": e.url
-            }
-        )
+    # Di solito il token di chi fa logout è già in cache: niente chiamata al servizio token
+    payload = await get_verified_payload(access_token.token)
+    response = await auth.logout(access_token, db, payload=payload)
+    await invalidate_cached_token(access_token.token)
+    return response
 
 
 @router.post("/register", status_code=202)
-@limiter.limit("5/minute")
-async def register(request: Request, user: UserRegistration, db: AsyncSession = Depends(get_db)):
-    try:
-        await auth.register(user, db)
-        return {"message": "Registration successful. Please check your email to verify your account."}
-
-    except OrientatiException as e:
-        return JSONResponse(
-            status_code=e.status_code,
-            content={
-                "message": e.message,
-                "details": e.details,
-                "url": e.url
-            }
-        )
+@limiter.limit(SENSITIVE_LIMIT)
+async def register(request: Request, user: UserRegistration):
+    await auth.register(user)
+    return {"message": "Registration successful. Please check your email to verify your account."}
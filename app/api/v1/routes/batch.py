@@ -0,0 +1,54 @@
+import asyncio
+
+import httpx
+from fastapi import APIRouter, Request
+
+from app.core.limiter import limiter, READ_LIMIT
+from app.schemas.batch import BatchRequest, BatchResponse, BatchSubRequest, BatchSubResponse
+
+router = APIRouter()
+
+
+async def _dispatch(client: httpx.AsyncClient, sub: BatchSubRequest, authorization: str | None) -> BatchSubResponse:
+    headers = dict(sub.headers)
+    if authorization and not any(key.lower() == "authorization" for key in headers):
+        headers["Authorization"] = authorization
+
+    response = await client.request(
+        sub.method,
+        sub.url,
+        json=sub.body if sub.method != "GET" else None,
+        headers=headers,
+    )
+    try:
+        body = response.json()
+    except ValueError:
+        body = response.text or None
+    return BatchSubResponse(id=sub.id, status=response.status_code, body=body)
+
+
+@router.post("/", response_model=BatchResponse)
+@limiter.limit(READ_LIMIT)
+async def batch(request: Request, batch_request: BatchRequest):
+    """
+    Esegue più richieste verso il gateway in un unico round-trip.
+
+    Le sotto-richieste vengono inoltrate in-process all'app ASGI e attese in parallelo;
+    ciascuna passa comunque per autenticazione e rate limit della rotta di destinazione.
+    L'header Authorization della richiesta esterna viene inoltrato se non specificato.
+
+    Returns:
+        BatchResponse: Risposte nello stesso ordine delle richieste
+    """
+    # Le sotto-richieste mantengono l'indirizzo del client originale, così il rate limit resta per utente
+    client_address = (request.client.host, request.client.port) if request.client else ("127.0.0.1", 0)
+    # raise_app_exceptions=False: un errore non gestito in una sotto-richiesta diventa la sua risposta 500,
+    # senza far fallire l'intero batch e perdere le altre risposte
+    transport = httpx.ASGITransport(app=request.app, client=client_address, raise_app_exceptions=False)
+    authorization = request.headers.get("Authorization")
+
+    async with httpx.AsyncClient(transport=transport, base_url=str(request.base_url)) as client:
+        responses = await asyncio.gather(
+            *(_dispatch(client, sub, authorization) for sub in batch_request.requests)
+        )
+    return BatchResponse(responses=list(responses))
@@ -1,23 +1,21 @@
 
 
-from typing import Optional
+from typing import Literal, Optional
 
 from fastapi import APIRouter
 from fastapi import Query
-from fastapi.responses import JSONResponse
 
 from app.schemas.citta import CittaList, CittaResponse, CittaUpdate, CittaCreate
 from app.services import citta as citta_service
-from app.services.http_client import OrientatiException
-from app.core.limiter import limiter
-from app.api.deps import validate_token
-from fastapi import Request, Depends, Body
+from app.core.limiter import limiter, READ_LIMIT, WRITE_LIMIT, DELETE_LIMIT
+from fastapi import Request, Body
 
 router = APIRouter()
+protected_router = APIRouter()
 
 
 @router.get("/", response_model=CittaList)
-@limiter.limit("60/minute")
+@limiter.limit(READ_LIMIT)
 async def get_citta(
         request: Request,
         limit: int = Query(default=10, ge=1, le=100, description="Numero di città da restituire (1-100)"),
@@ -25,7 +23,7 @@ async def get_citta(
         search: Optional[str] = Query(default=None,
                                       description="Termine di ricerca per filtrare le città per nome"),
         sort_by: str = Query(default="name", description="Campo per ordinamento (es. nome)"),
-        order: str = Query(default="asc", regex="^(asc|desc)$", description="Ordine: asc o desc")
+        order: Literal["asc", "desc"] = Query(default="asc", description="Ordine: asc o desc")
 ):
     """
     Recupera la lista delle città, con opzioni di paginazione e filtro.
@@ -43,7 +41,7 @@ async def get_citta(
 
 
 @router.get("/{citta_id}", response_model=CittaResponse)
-@limiter.limit("60/minute")
+@limiter.limit(READ_LIMIT)
 async def get_citta_by_id(request: Request, citta_id: int):
     """
     Recupera i dettagli di una città dato il suo ID.
@@ -58,7 +56,7 @@ async def get_citta_by_id(request: Request, citta_id: int):
 
 
 @router.get("/zipcode/{zipcode}", response_model=CittaResponse)
-@limiter.limit("60/minute")
+@limiter.limit(READ_LIMIT)
 async def get_citta_by_zipcode(request: Request, zipcode: str):
     """
     Recupera i dettagli di una città dato il suo CAP.
@@ -72,9 +70,9 @@ async def get_citta_by_zipcode(request: Request, zipcode: str):
     return await citta_service.get_citta_by_zipcode(zipcode)
 
 
-@router.post("/", response_model=CittaResponse)
-@limiter.limit("10/minute")
-async def post_citta(request: Request, citta: CittaCreate = Body(...), payload: dict = Depends(validate_token)):
+@protected_router.post("/", response_model=CittaResponse)
+@limiter.limit(WRITE_LIMIT)
+async def post_citta(request: Request, citta: CittaCreate = Body(...)):
     """
     Crea una nuova città.
 
@@ -87,9 +85,9 @@ async def post_citta(request: Request, citta: CittaCreate = Body(...), payload:
     return await citta_service.post_citta(citta)
 
 
-@router.put("/{citta_id}", response_model=CittaResponse)
-@limiter.limit("10/minute")
-async def put_citta(request: Request, citta_id: int, citta: CittaUpdate = Body(...), payload: dict = Depends(validate_token)):
+@protected_router.put("/{citta_id}", response_model=CittaResponse)
+@limiter.limit(WRITE_LIMIT)
+async def put_citta(request: Request, citta_id: int, citta: CittaUpdate = Body(...)):
     """
     Aggiorna i dettagli di una città esistente.
 
@@ -103,9 +101,9 @@ async def put_citta(request: Request, citta_id: int, citta: CittaUpdate = Body(.
     return await citta_service.put_citta(citta_id, citta)
 
 
-@router.delete("/{citta_id}")
-@limiter.limit("5/minute")
-async def delete_citta(request: Request, citta_id: int, payload: dict = Depends(validate_token)):
+@protected_router.delete("/{citta_id}")
+@limiter.limit(DELETE_LIMIT)
+async def delete_citta(request: Request, citta_id: int):
     """
     Elimina una città esistente.
 
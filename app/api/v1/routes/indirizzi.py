@@ -1,23 +1,21 @@
 
 
-from typing import Optional
+from typing import Literal, Optional
 
 from fastapi import APIRouter
 from fastapi import Query
-from fastapi.responses import JSONResponse
 
 from app.schemas.indirizzo import IndirizzoList, IndirizzoResponse, IndirizzoCreate, IndirizzoUpdate
 from app.services import indirizzi as indirizzi_service
-from app.services.http_client import OrientatiException
-from app.core.limiter import limiter
-from app.api.deps import validate_token
-from fastapi import Request, Depends, Body
+from app.core.limiter import limiter, READ_LIMIT, WRITE_LIMIT, DELETE_LIMIT
+from fastapi import Request, Body
 
 router = APIRouter()
+protected_router = APIRouter()
 
 
 @router.get("/", response_model=IndirizzoList)
-@limiter.limit("60/minute")
+@limiter.limit(READ_LIMIT)
 async def get_indirizzi(
         request: Request,
         limit: int = Query(default=10, ge=1, le=100, description="Numero di indirizzi da restituire (1-100)"),
@@ -25,7 +23,7 @@ async def get_indirizzi(
         search: Optional[str] = Query(default=None,
                                       description="Termine di ricerca per filtrare gli indirizzi per nome"),
         sort_by: str = Query(default="name", description="Campo per ordinamento (es. nome)"),
-        order: str = Query(default="asc", regex="^(asc|desc)$", description="Ordine: asc o desc")
+        order: Literal["asc", "desc"] = Query(default="asc", description="Ordine: asc o desc")
 ):
     """
     Recupera la lista delle materie, con opzioni di paginazione e filtro.
@@ -43,7 +41,7 @@ async def get_indirizzi(
 
 
 @router.get("/{indirizzo_id}", response_model=IndirizzoResponse)
-@limiter.limit("60/minute")
+@limiter.limit(READ_LIMIT)
 async def get_indirizzo_by_id(request: Request, indirizzo_id: int):
     """
     Recupera i dettagli di un indirizzo di studio dato il suo ID.
@@ -57,9 +55,9 @@ async def get_indirizzo_by_id(request: Request, indirizzo_id: int):
     return await indirizzi_service.get_indirizzo_by_id(indirizzo_id)
 
 
-@router.post("/", response_model=IndirizzoResponse)
-@limiter.limit("10/minute")
-async def post_indirizzo(request: Request, indirizzo: IndirizzoCreate = Body(...), payload: dict = Depends(validate_token)):
+@protected_router.post("/", response_model=IndirizzoResponse)
+@limiter.limit(WRITE_LIMIT)
+async def post_indirizzo(request: Request, indirizzo: IndirizzoCreate = Body(...)):
     """
     Crea un nuovo indirizzo di studio.
 
@@ -72,9 +70,9 @@ async def post_indirizzo(request: Request, indirizzo: IndirizzoCreate = Body(...
     return await indirizzi_service.post_indirizzo(indirizzo)
 
 
-@router.delete("/{indirizzo_id}")
-@limiter.limit("5/minute")
-async def delete_indirizzo(request: Request, indirizzo_id: int, payload: dict = Depends(validate_token)):
+@protected_router.delete("/{indirizzo_id}")
+@limiter.limit(DELETE_LIMIT)
+async def delete_indirizzo(request: Request, indirizzo_id: int):
     """
     Elimina un indirizzo di studio dato il suo ID.
 
@@ -88,9 +86,9 @@ async def delete_indirizzo(request: Request, indirizzo_id: int, payload: dict =
     return {"message": "Indirizzo eliminato con successo"}
 
 
-@router.put("/{indirizzo_id}", response_model=IndirizzoResponse)
-@limiter.limit("10/minute")
-async def put_indirizzo(request: Request, indirizzo_id: int, indirizzo: IndirizzoUpdate = Body(...), payload: dict = Depends(validate_token)):
+@protected_router.put("/{indirizzo_id}", response_model=IndirizzoResponse)
+@limiter.limit(WRITE_LIMIT)
+async def put_indirizzo(request: Request, indirizzo_id: int, indirizzo: IndirizzoUpdate = Body(...)):
     """
     Aggiorna i dettagli di un indirizzo di studio esistente.
 
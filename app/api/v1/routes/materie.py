@@ -1,30 +1,29 @@
 
 
-from typing import Optional
+from typing import Literal, Optional
 
 from fastapi import APIRouter
 from fastapi import Query
-from fastapi.responses import JSONResponse
 
 from app.schemas.materia import MateriaList, MateriaResponse, MateriaCreate, MateriaUpdate
 from app.services import materie as materie_service
-from app.services.http_client import OrientatiException
-from app.core.limiter import limiter
-from app.api.deps import validate_token
-from fastapi import Request, Depends, Body
+from app.api.responses import etag_response
+from app.core.limiter import limiter, READ_LIMIT, WRITE_LIMIT, DELETE_LIMIT
+from fastapi import Request, Body
 
 router = APIRouter()
+protected_router = APIRouter()
 
 
 @router.get("/", response_model=MateriaList)
-@limiter.limit("60/minute")
+@limiter.limit(READ_LIMIT)
 async def get_materie(
         request: Request,
         limit: int = Query(default=10, ge=1, le=100, description="Numero di materie da restituire (1-100)"),
         offset: int = Query(default=0, ge=0, description="Numero di materie da saltare per la paginazione"),
         search: Optional[str] = Query(default=None, description="Termine di ricerca per filtrare le materie per nome"),
         sort_by: str = Query(default="name", description="Campo per ordinamento (es. nome)"),
-        order: str = Query(default="asc", regex="^(asc|desc)$", description="Ordine: asc o desc")
+        order: Literal["asc", "desc"] = Query(default="asc", description="Ordine: asc o desc")
 ):
     """
     Recupera la lista delle materie, con opzioni di paginazione e filtro.
@@ -42,7 +41,7 @@ async def get_materie(
 
 
 @router.get("/{materia_id}", response_model=MateriaResponse)
-@limiter.limit("60/minute")
+@limiter.limit(READ_LIMIT)
 async def get_materia_by_id(request: Request, materia_id: int):
     """
     Recupera i dettagli di una materia dato il suo ID.
@@ -53,12 +52,13 @@ async def get_materia_by_id(request: Request, materia_id: int):
     Returns:
         MateriaResponse: Dettagli della materia
     """
-    return await materie_service.get_materia_by_id(materia_id)
+    materia = await materie_service.get_materia_by_id(materia_id)
+    return etag_response(request, MateriaResponse.model_validate(materia))
 
 
-@router.post("/", response_model=MateriaResponse)
-@limiter.limit("10/minute")
-async def post_materia(request: Request, materia: MateriaCreate = Body(...), payload: dict = Depends(validate_token)):
+@protected_router.post("/", response_model=MateriaResponse)
+@limiter.limit(WRITE_LIMIT)
+async def post_materia(request: Request, materia: MateriaCreate = Body(...)):
     """
     Crea una nuova materia.
 
@@ -71,9 +71,9 @@ async def post_materia(request: Request, materia: MateriaCreate = Body(...), pay
     return await materie_service.post_materia(materia)
 
 
-@router.put("/{materia_id}", response_model=MateriaResponse)
-@limiter.limit("10/minute")
-async def put_materia(request: Request, materia_id: int, materia: MateriaUpdate = Body(...), payload: dict = Depends(validate_token)):
+@protected_router.put("/{materia_id}", response_model=MateriaResponse)
+@limiter.limit(WRITE_LIMIT)
+async def put_materia(request: Request, materia_id: int, materia: MateriaUpdate = Body(...)):
     """
     Aggiorna i dettagli di una materia esistente.
 
@@ -87,9 +87,9 @@ async def put_materia(request: Request, materia_id: int, materia: MateriaUpdate
     return await materie_service.put_materia(materia_id, materia)
 
 
-@router.delete("/{materia_id}", response_model=dict)
-@limiter.limit("5/minute")
-async def delete_materia(request: Request, materia_id: int, payload: dict = Depends(validate_token)):
+@protected_router.delete("/{materia_id}", response_model=dict)
+@limiter.limit(DELETE_LIMIT)
+async def delete_materia(request: Request, materia_id: int):
     """
     Elimina una materia esistente.
 
@@ -102,10 +102,9 @@ async def delete_materia(request: Request, materia_id: int, payload: dict = Depe
     return await materie_service.delete_materia(materia_id)
 
 
-@router.post("/link-indirizzo/{materia_id}/{indirizzo_id}")
-@limiter.limit("10/minute")
-async def link_materia_to_indirizzo(request: Request, materia_id: int, indirizzo_id:
-int, payload: dict = Depends(validate_token)):
+@protected_router.post("/link-indirizzo/{materia_id}/{indirizzo_id}")
+@limiter.limit(WRITE_LIMIT)
+async def link_materia_to_indirizzo(request: Request, materia_id: int, indirizzo_id: int):
     """
     Collega una materia a un indirizzo di studio.
 
@@ -116,9 +115,9 @@ int, payload: dict = Depends(validate_token)):
     return await materie_service.link_materia_to_indirizzo(materia_id, indirizzo_id)
 
 
-@router.delete("/unlink-indirizzo/{materia_id}/{indirizzo_id}")
-@limiter.limit("10/minute")
-async def unlink_materia_from_indirizzo(request: Request, materia_id: int, indirizzo_id: int, payload: dict = Depends(validate_token)):
+@protected_router.delete("/unlink-indirizzo/{materia_id}/{indirizzo_id}")
+@limiter.limit(WRITE_LIMIT)
+async def unlink_materia_from_indirizzo(request: Request, materia_id: int, indirizzo_id: int):
     """
     Scollega una materia da un indirizzo di studio.
 
@@ -1,23 +1,23 @@
 
 
-from typing import Optional
+from typing import Literal, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter
 from fastapi import Query
-from fastapi.responses import JSONResponse
 
 from app.schemas.school import SchoolsList, SchoolResponse, SchoolCreate, SchoolUpdate
 from app.services import school as school_service
 from app.services.http_client import OrientatiException
-from app.core.limiter import limiter
-from app.api.deps import validate_token
-from fastapi import Request, Depends, Body
+from app.api.responses import etag_response
+from app.core.limiter import limiter, READ_LIMIT, WRITE_LIMIT, DELETE_LIMIT
+from fastapi import Request, Body
 
 router = APIRouter()
+protected_router = APIRouter()
 
 
 @router.get("/", response_model=SchoolsList)
-@limiter.limit("60/minute")
+@limiter.limit(READ_LIMIT)
 async def get_schools(
         request: Request,
         limit: int = Query(default=10, ge=1, le=100, description="Numero di scuole da restituire (1-100)"),
@@ -29,7 +29,7 @@ async def get_schools(
         indirizzo: Optional[str] = Query(default=None,
                                          description="Filtra per tipo di scuola (es. Liceo, informatico, ecc.)"),
         sort_by: str = Query(default="name", description="Campo per ordinamento (es. nome, città, provincia)"),
-        order: str = Query(default="asc", regex="^(asc|desc)$", description="Ordine: asc o desc")
+        order: Literal["asc", "desc"] = Query(default="asc", description="Ordine: asc o desc")
 ):
     """
     Recupera la lista delle scuole con opzioni di paginazione e filtro.
@@ -52,7 +52,7 @@ async def get_schools(
 
 
 @router.get("/{school_id}", response_model=SchoolResponse)
-@limiter.limit("60/minute")
+@limiter.limit(READ_LIMIT)
 async def get_school(request: Request, school_id: int):
     """
     Recupera i dettagli di una scuola specifica per ID.
@@ -71,12 +71,12 @@ async def get_school(request: Request, school_id: int):
             details={"message": f"School with ID {school_id} not found"},
             url=f"/schools/{school_id}"
         )
-    return school
+    return etag_response(request, SchoolResponse.model_validate(school))
 
 
-@router.post("/", response_model=SchoolResponse, status_code=201)
-@limiter.limit("10/minute")
-async def post_school(request: Request, school: SchoolCreate = Body(...), payload: dict = Depends(validate_token)):
+@protected_router.post("/", response_model=SchoolResponse, status_code=201)
+@limiter.limit(WRITE_LIMIT)
+async def post_school(request: Request, school: SchoolCreate = Body(...)):
     """
     Crea una nuova scuola.
 
@@ -89,9 +89,9 @@ async def post_school(request: Request, school: SchoolCreate = Body(...), payloa
     return await school_service.create_school(school)
 
 
-@router.put("/{school_id}", response_model=SchoolResponse)
-@limiter.limit("10/minute")
-async def put_school(request: Request, school_id: int, school: SchoolUpdate = Body(...), payload: dict = Depends(validate_token)):
+@protected_router.put("/{school_id}", response_model=SchoolResponse)
+@limiter.limit(WRITE_LIMIT)
+async def put_school(request: Request, school_id: int, school: SchoolUpdate = Body(...)):
     """
     Aggiorna i dettagli di una scuola esistente.
 
@@ -106,9 +106,9 @@ async def put_school(request: Request, school_id: int, school: SchoolUpdate = Bo
     return updated_school
 
 
-@router.delete("/{school_id}", response_model=dict)
-@limiter.limit("5/minute")
-async def delete_school(request: Request, school_id: int, payload: dict = Depends(validate_token)):
+@protected_router.delete("/{school_id}", response_model=dict)
+@limiter.limit(DELETE_LIMIT)
+async def delete_school(request: Request, school_id: int):
     """
     Elimina una scuola esistente.
 
@@ -1,32 +1,27 @@
 
 
-from typing import Annotated
-from pydantic import BaseModel
 from fastapi import APIRouter, Request, Depends, Body
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 
-from app.api.deps import validate_token, reusable_oauth2
+from app.api.deps import CurrentTokenPayload
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db.session import get_db
 
 from app.core.logging import get_logger
-from app.core.limiter import limiter
-from app.schemas.users import ChangePasswordResponse, UpdateUserRequest, DeleteUserResponse
-from app.services import users, auth
+from app.core.limiter import limiter, READ_LIMIT, WRITE_LIMIT, DELETE_LIMIT, SESSION_LIMIT, SENSITIVE_LIMIT
+from app.schemas.users import ChangePasswordReq, ChangePasswordResponse, UpdateUserRequest, UpdateUserResponse, \
+    DeleteUserResponse
+from app.services import users
 from app.services.http_client import OrientatiException, HttpCodes
 
 logger = get_logger(__name__)
 router = APIRouter()
 
 
-class ChangePasswordReq(BaseModel):
-    old_password: str
-    new_password: str
-
 @router.post("/change_password", response_model=ChangePasswordResponse)
-@limiter.limit("5/minute")
-async def change_password(request: Request, passwords: ChangePasswordReq = Body(...), payload: dict = Depends(validate_token)):
+@limiter.limit(SENSITIVE_LIMIT)
+async def change_password(request: Request, payload: CurrentTokenPayload, passwords: ChangePasswordReq = Body(...)):
     changed = await users.change_password(passwords, payload["user_id"])
     if changed:
         return ChangePasswordResponse()
@@ -40,31 +35,38 @@ async def change_password(request: Request, passwords: ChangePasswordReq = Body(
 
 
 
-@router.patch("/", response_model=UpdateUserRequest)
-@limiter.limit("20/minute")
-async def update_user_self(request: Request, new_data: UpdateUserRequest = Body(...), payload: dict = Depends(validate_token)):
+@router.patch("/", response_model=UpdateUserResponse)
+@limiter.limit(SESSION_LIMIT)
+async def update_user_self(request: Request, payload: CurrentTokenPayload, new_data: UpdateUserRequest = Body(...)):
     return await users.update_user(payload["user_id"], new_data)
 
 
 
-@router.patch("/{user_id}", response_model=UpdateUserRequest)
-@limiter.limit("20/minute")
-async def update_user(request: Request, user_id: int, new_data: UpdateUserRequest = Body(...), payload: dict = Depends(validate_token)):
+async def require_self_update(user_id: int, payload: CurrentTokenPayload) -> None:
+    """
+    Consente la modifica solo del proprio utente.
+    Come dipendenza viene risolta prima della validazione del body: le richieste vietate non lo analizzano.
+    """
     # TODO: verificare che l'utente abbia i permessi per modificare un altro utente
     if payload["user_id"] != user_id:
-            raise OrientatiException(
+        raise OrientatiException(
             status_code=HttpCodes.FORBIDDEN,
             message="Forbidden",
             details={"message": "You are not allowed to update this user"},
             url=f"users/{user_id}"
         )
+
+
+@router.patch("/{user_id}", response_model=UpdateUserResponse, dependencies=[Depends(require_self_update)])
+@limiter.limit(SESSION_LIMIT)
+async def update_user(request: Request, user_id: int, new_data: UpdateUserRequest = Body(...)):
     return await users.update_user(user_id, new_data)
 
 
 
 @router.delete("/{user_id}", response_model=DeleteUserResponse)
-@limiter.limit("5/minute")
-async def delete_user(request: Request, user_id: int, payload: dict = Depends(validate_token)):
+@limiter.limit(DELETE_LIMIT)
+async def delete_user(request: Request, user_id: int, payload: CurrentTokenPayload):
     # TODO: verificare che l'utente abbia i permessi per eliminare un altro utente
     if payload["user_id"] != user_id:
             raise OrientatiException(
@@ -79,11 +81,11 @@ async def delete_user(request: Request, user_id: int, payload: dict = Depends(va
 
 
 @router.get("/email_status")
-@limiter.limit("60/minute")
-async def email_status(request: Request, token: str = Depends(reusable_oauth2), payload: dict = Depends(validate_token), db: AsyncSession = Depends(get_db)):
-    is_verified = await users.get_email_status_from_token(token, db)
+@limiter.limit(READ_LIMIT)
+async def email_status(request: Request, payload: CurrentTokenPayload, db: AsyncSession = Depends(get_db)):
+    is_verified = await users.get_email_status(payload["user_id"], payload["session_id"], db)
 
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=HttpCodes.OK,
         content={
             "status": "verified" if is_verified else "not verified",
@@ -93,11 +95,11 @@ async def email_status(request: Request, token: str = Depends(reusable_oauth2),
 
 
 @router.get("/verify_email")
-@limiter.limit("10/minute")
+@limiter.limit(WRITE_LIMIT)
 async def verify_email(request: Request, token: str):
     verified = await users.verify_email(token)
     if verified:
-        return JSONResponse(
+        return ORJSONResponse(
             status_code=HttpCodes.OK,
             content={
                 "message": "Email verified successfully"
@@ -5,6 +5,10 @@ from app.core.logging import get_logger
 router = APIRouter()
 logger = get_logger(__name__)
 
+# I frame binari restano bytes dall'ingresso all'uscita, senza decodifica/ricodifica UTF-8
+ECHO_PREFIX = "Message received: "
+ECHO_PREFIX_BYTES = ECHO_PREFIX.encode()
+
 async def get_redis_service():
     return AsyncRedisSingleton()
 
@@ -20,24 +24,29 @@ async def websocket_endpoint(
     ticket_data = await redis_service.consume_ws_ticket(ticket)
     
     if not ticket_data:
-        logger.warning(f"Invalid or expired ticket used for WebSocket connection: {ticket}")
+        logger.warning("Invalid or expired ticket used for WebSocket connection: %s", ticket)
         await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
         return
 
     # 2. Accept Connection
     await websocket.accept()
     user_id = ticket_data.get("user_id")
-    logger.info(f"WebSocket connected for user {user_id}")
+    logger.info("WebSocket connected for user %s", user_id)
 
     try:
         while True:
-            data = await websocket.receive_text()
-            # Echo logic or message handling
-            await websocket.send_text(f"Message received: {data}")
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", status.WS_1000_NORMAL_CLOSURE))
+            # Echo logic or message handling: risponde con lo stesso tipo di frame ricevuto
+            if message.get("bytes") is not None:
+                await websocket.send_bytes(ECHO_PREFIX_BYTES + message["bytes"])
+            else:
+                await websocket.send_text(ECHO_PREFIX + message["text"])
     except WebSocketDisconnect:
-        logger.info(f"WebSocket disconnected for user {user_id}")
+        logger.info("WebSocket disconnected for user %s", user_id)
     except Exception as e:
-        logger.error(f"WebSocket error: {e}")
+        logger.error("WebSocket error: %s", e)
         try:
             await websocket.close()
         except:
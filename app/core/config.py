@@ -1,3 +1,5 @@
+from functools import lru_cache
+
 from pydantic_settings import SettingsConfigDict, BaseSettings
 
 
@@ -5,6 +7,9 @@ class Settings(BaseSettings):
     SERVICE_NAME: str = "FastAPI Gateway"
     SERVICE_VERSION: str = "0.1.0"
     DATABASE_URL: str = "sqlite+aiosqlite:///./database.db"
+    DB_POOL_SIZE: int = 20  # Connessioni persistenti per worker (solo PostgreSQL)
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT_SECONDS: int = 30
     RABBITMQ_HOST: str = "localhost"
     RABBITMQ_PORT: int = 5672
     RABBITMQ_USER: str = "guest"
@@ -17,8 +22,27 @@ class Settings(BaseSettings):
     SENTRY_RELEASE: str = "0.1.0"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
     REFRESH_TOKEN_EXPIRE_DAYS: int = 30
+    TOKEN_CACHE_TTL_SECONDS: int = 300  # Durata massima in cache di un payload verificato
+    # Durata della copia in-process: limita quanto un worker può servire un token di una sessione revocata
+    TOKEN_LOCAL_CACHE_TTL_SECONDS: int = 30
+    # Verifica locale dei JWT (disattivata se vuoto): JWKS pubblicato dal servizio token
+    TOKEN_JWKS_URL: str = ""
+    TOKEN_JWKS_TTL_SECONDS: int = 3600
+    TOKEN_JWT_ALGORITHMS: list[str] = ["RS256"]
+    # Issuer e audience attesi: senza entrambi la verifica locale resta disattivata
+    TOKEN_JWT_ISSUER: str = ""
+    TOKEN_JWT_AUDIENCE: str = ""
+    # Solo gli access token vengono verificati localmente; gli altri tipi passano dal servizio token
+    TOKEN_JWT_TYPE_CLAIM: str = "token_use"
+    TOKEN_JWT_ACCESS_TOKEN_TYPE: str = "access"
+    # Argon2id, profilo OWASP (46 MiB, t=2, p=1): i parametri sono salvati nell'hash, quelli vecchi restano verificabili
+    ARGON2_MEMORY_COST: int = 47104  # KiB
+    ARGON2_TIME_COST: int = 2
+    ARGON2_PARALLELISM: int = 1
     API_PREFIX: str = "/api/v1"
     ALLOWED_ORIGINS: list[str] = ["*"]
+    # Comprime solo le risposte più grandi (0 = disattivata, es. dietro un proxy che comprime già)
+    GZIP_MINIMUM_SIZE: int = 8192
 
     #### REDIS
     REDIS_HOST: str = "gateway-redis"
@@ -26,6 +50,18 @@ class Settings(BaseSettings):
     REDIS_USER: str = "default"
     REDIS_PASSWORD: str = "redis_secure_password"
     REDIS_DB: int = 0
+    REDIS_MAX_CONNECTIONS: int = 64
+    REDIS_HEALTH_CHECK_INTERVAL_SECONDS: int = 30
+    RESPONSE_CACHE_TTL_SECONDS: int = 60  # Cache delle GET verso i microservizi
+    RESPONSE_LOCAL_CACHE_TTL_SECONDS: float = 5.0  # Copia in-process delle stesse risposte (0 = disattivata)
+
+    #### HTTP CLIENT         # noqa: E266
+    HTTP_MAX_CONNECTIONS: int = 200
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 100
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP_TIMEOUT_SECONDS: float = 5.0
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 1.0
+    HTTP_CONNECT_RETRIES: int = 2
 
     #### ROUTES              # noqa: E266
     TOKEN_SERVICE_URL: str = "http://token:8002"
@@ -38,4 +74,10 @@ class Settings(BaseSettings):
     )
 
 
-settings = Settings()
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Restituisce le impostazioni, lette da ambiente e .env una sola volta per processo."""
+    return Settings()
+
+
+settings = get_settings()
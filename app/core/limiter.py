@@ -12,4 +12,24 @@ def get_limiter_storage_uri():
         return "memory://"
     return f"redis://{settings.REDIS_USER}:{settings.REDIS_PASSWORD}@{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}"
 
-limiter = Limiter(key_func=get_remote_address_unsafe, storage_uri=get_limiter_storage_uri(), enabled=True)
+def get_limiter_storage_options():
+    if settings.ENVIRONMENT == "testing":
+        return {}
+    # limits usa un client redis sincrono: non può condividere il pool asyncio, ma ne replica la configurazione
+    return {
+        "max_connections": settings.REDIS_MAX_CONNECTIONS,
+        "socket_keepalive": True,
+        "health_check_interval": settings.REDIS_HEALTH_CHECK_INTERVAL_SECONDS,
+    }
+
+# moving-window: su Redis il controllo è un unico script Lua (EVALSHA) atomico e condiviso da tutti i worker
+limiter = Limiter(key_func=get_remote_address_unsafe, storage_uri=get_limiter_storage_uri(),
+                  storage_options=get_limiter_storage_options(),
+                  strategy="moving-window", enabled=True)
+
+# Limiti per categoria di endpoint: slowapi li converte in RateLimitItem una sola volta, alla decorazione
+READ_LIMIT = "60/minute"
+WRITE_LIMIT = "10/minute"
+DELETE_LIMIT = "5/minute"
+SESSION_LIMIT = "20/minute"  # refresh, logout, aggiornamento profilo
+SENSITIVE_LIMIT = "5/minute"  # login, registrazione, cambio password
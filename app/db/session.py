@@ -1,7 +1,7 @@
 from typing import AsyncGenerator
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
 
 from app.core.config import settings
 
@@ -15,21 +15,38 @@ db_url = db_url.replace("postgresql+psycopg2://", "postgresql+asyncpg://")
 if db_url.startswith("sqlite://") and not db_url.startswith("sqlite+aiosqlite://"):
     db_url = db_url.replace("sqlite://", "sqlite+aiosqlite://")
 
-engine = create_async_engine(
-    db_url,
-    pool_size=1000,
-    max_overflow=2000,
-    pool_timeout=5,
-    pool_recycle=1800,
-    pool_pre_ping=True,
+if db_url.startswith("sqlite"):
+    # SQLite è un file locale: un pool non porta benefici e si aprono le connessioni su richiesta.
     # check_same_thread=False è necessario per SQLite in async
-    connect_args={"check_same_thread": False} if "sqlite" in db_url else {}
-)
-AsyncSessionLocal = sessionmaker(
-    autocommit=False, 
-    autoflush=False, 
-    bind=engine, 
-    class_=AsyncSession
+    engine_kwargs = {"poolclass": NullPool, "connect_args": {"check_same_thread": False}}
+else:
+    # Il pool è per worker: pool_size + max_overflow moltiplicato per i worker deve restare
+    # sotto max_connections di PostgreSQL
+    engine_kwargs = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": 1800,
+        # Niente SELECT 1 a ogni checkout: le connessioni morte le scoprono i keepalive TCP,
+        # e un errore di disconnessione invalida comunque l'intero pool
+        "pool_pre_ping": False,
+        "connect_args": {
+            # Query brevi e OLTP: il JIT di PostgreSQL aggiunge solo latenza
+            "server_settings": {"jit": "off", "tcp_keepalives_idle": "30"},
+            "timeout": 10,
+            # Le query sono poche e parametrizzate: restano preparate per tutta la vita della connessione
+            "statement_cache_size": 1024,
+            "prepared_statement_cache_size": 1024,
+        },
+    }
+
+engine = create_async_engine(db_url, **engine_kwargs)
+# expire_on_commit=False: dopo il commit gli oggetti restano leggibili senza una nuova query,
+# così la connessione torna al pool prima delle chiamate HTTP verso gli altri servizi
+AsyncSessionLocal = async_sessionmaker(
+    engine,
+    autoflush=False,
+    expire_on_commit=False
 )
 
 
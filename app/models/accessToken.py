@@ -12,7 +12,7 @@ class AccessToken(Base):
     __tablename__ = "accessTokens"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    session_id: Mapped[int] = mapped_column(ForeignKey("sessions.id"))
+    session_id: Mapped[int] = mapped_column(ForeignKey("sessions.id"), index=True)
     token: Mapped[str] = mapped_column(String, nullable=False, unique=True)
     is_expired: Mapped[bool] = mapped_column(default=False, nullable=False)
     created_at: Mapped[datetime] = mapped_column(
@@ -12,7 +12,7 @@ class RefreshToken(Base):
     __tablename__ = "refreshTokens"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    session_id: Mapped[int] = mapped_column(ForeignKey("sessions.id"))
+    session_id: Mapped[int] = mapped_column(ForeignKey("sessions.id"), index=True)
     token: Mapped[str] = mapped_column(String, nullable=False, unique=True)
     accessToken_id: Mapped[int] = mapped_column(ForeignKey("accessTokens.id"))
     is_expired: Mapped[bool] = mapped_column(default=False, nullable=False)
@@ -0,0 +1,43 @@
+import posixpath
+import re
+from typing import Any, Literal
+from urllib.parse import unquote
+
+from pydantic import BaseModel, Field, field_validator
+
+# Numero massimo di sotto-richieste accettate in un singolo batch
+MAX_BATCH_REQUESTS = 20
+
+
+class BatchSubRequest(BaseModel):
+    id: str
+    method: Literal["GET", "POST", "PUT", "PATCH", "DELETE"] = "GET"
+    url: str
+    body: Any | None = None
+    headers: dict[str, str] = Field(default_factory=dict)
+
+    @field_validator("url")
+    @classmethod
+    def url_must_be_relative(cls, value: str) -> str:
+        # Solo percorsi interni al gateway: niente host esterni né batch annidati
+        if not value.startswith("/") or value.startswith("//"):
+            raise ValueError("url must be a path relative to the gateway")
+        # Il percorso viene confrontato come lo vede il router: decodificato (es. /%62atch) e normalizzato
+        path = posixpath.normpath(re.sub(r"/+", "/", unquote(value.split("?", 1)[0])))
+        if path.rstrip("/").endswith("/batch"):
+            raise ValueError("nested batch requests are not allowed")
+        return value
+
+
+class BatchRequest(BaseModel):
+    requests: list[BatchSubRequest] = Field(min_length=1, max_length=MAX_BATCH_REQUESTS)
+
+
+class BatchSubResponse(BaseModel):
+    id: str
+    status: int
+    body: Any | None = None
+
+
+class BatchResponse(BaseModel):
+    responses: list[BatchSubResponse]
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 
 class ChangePasswordReq(BaseModel):
     old_password: str
@@ -6,6 +6,7 @@ class ChangePasswordReq(BaseModel):
 
 class ChangePasswordResponse(BaseModel):
     message: str = "Password changed successfully"
+    model_config = ConfigDict(frozen=True)
     
 class UpdateUserRequest(BaseModel):
     name: str | None = None
@@ -13,6 +14,8 @@ class UpdateUserRequest(BaseModel):
 
 class UpdateUserResponse(BaseModel):
     message: str = "User updated successfully"
+    model_config = ConfigDict(frozen=True)
     
 class DeleteUserResponse(BaseModel):
-    message: str = "User deleted successfully"
\ No newline at end of file
+    message: str = "User deleted successfully"
+    model_config = ConfigDict(frozen=True)
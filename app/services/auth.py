@@ -1,27 +1,51 @@
+import asyncio
+import json
+import time
+from collections import deque
 from datetime import datetime, timedelta
 
+from jose import jwt, JWTError
 from passlib.context import CryptContext
 from passlib.exc import UnknownHashError
-from sqlalchemy import select
+from sqlalchemy import select, insert, update, bindparam, literal
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
 from app.core.logging import get_logger
-from app.db.session import get_db
+from app.db.session import AsyncSessionLocal
 from app.models.accessToken import AccessToken
 from app.models.refreshToken import RefreshToken
 from app.models.session import Session
 from app.models.user import User
 from app.schemas.auth import UserLogin, TokenResponse, TokenRequest, UserRegistration, UserLogout
-from app.services.http_client import OrientatiException, HttpMethod, HttpUrl, HttpParams, send_request, HttpCodes
+from app.services.http_client import OrientatiException, HttpMethod, HttpUrl, send_request, HttpCodes, \
+    get_client
 from app.services.redis_service import AsyncRedisSingleton
 
 logger = get_logger(__name__)
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto", argon2__rounds=1, argon2__memory_cost=64)
+_MINUTES_PER_DAY = 24 * 60
+
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__type="ID",
+    argon2__memory_cost=settings.ARGON2_MEMORY_COST,
+    argon2__time_cost=settings.ARGON2_TIME_COST,
+    argon2__parallelism=settings.ARGON2_PARALLELISM,
+)
+# Solo il backend C (argon2-cffi): se manca l'avvio fallisce, invece di ripiegare su argon2pure, molto più lento
+pwd_context.handler("argon2").set_backend("argon2_cffi")
 # Hash fittizio per mitigazione attacchi temporali
+_dummy_hash_start = time.perf_counter()
 DUMMY_PWD_HASH = pwd_context.hash("dummy_password_for_safety")
 
+# Durate (in secondi) delle ultime verifiche argon2 reali, attesa in coda al thread pool compresa.
+# Il P99 è il tempo atteso dal login per utenti inesistenti; l'hash fittizio fornisce il primo campione,
+# così la stima esiste già alla prima richiesta
+_VERIFY_LATENCY_WINDOW = 200
+_verify_durations: deque[float] = deque([time.perf_counter() - _dummy_hash_start], maxlen=_VERIFY_LATENCY_WINDOW)
+
 
 # Custom exception per invalid credentials
 class InvalidCredentialsException(OrientatiException):
@@ -80,23 +104,18 @@ async def create_access_token(data: dict, expire_minutes: int = settings.ACCESS_
     Returns:
         str: Il token di accesso creato.
     """
-    try:
-        params = HttpParams(data)
-        if expire_minutes:
-            params.add_param("expires_in", expire_minutes)
-
-        json_data, status_code = await send_request(
-            url=HttpUrl.TOKEN_SERVICE,
-            method=HttpMethod.POST,
-            endpoint="/token/create",
-            _params=params
-        )
-        if status_code >= 400:
-            message = json_data.get("message", "Error creating access token") if json_data else "Error creating access token"
-            raise OrientatiException(message=message, status_code=status_code, details={"message": message})
-        return json_data
-    except OrientatiException as e:
-        raise e
+    params = {**data, "expires_in": expire_minutes} if expire_minutes else data
+
+    json_data, status_code = await send_request(
+        url=HttpUrl.TOKEN_SERVICE,
+        method=HttpMethod.POST,
+        endpoint="/token/create",
+        _params=params
+    )
+    if status_code >= 400:
+        message = json_data.get("message", "Error creating access token") if json_data else "Error creating access token"
+        raise OrientatiException(message=message, status_code=status_code, details={"message": message})
+    return json_data
 
 
 async def create_refresh_token(data: dict, expire_days: int = settings.REFRESH_TOKEN_EXPIRE_DAYS) -> dict:
@@ -111,23 +130,41 @@ async def create_refresh_token(data: dict, expire_days: int = settings.REFRESH_T
     Returns:
         str: Il token di refresh creato.
     """
+    params = {**data, "expires_in": expire_days * _MINUTES_PER_DAY} if expire_days else data
+
+    json_data, status_code = await send_request(
+        url=HttpUrl.TOKEN_SERVICE,
+        method=HttpMethod.POST,
+        endpoint="/token/create",
+        _params=params
+    )
+    if status_code >= 400:
+        message = json_data.get("message", "Error creating refresh token") if json_data else "Error creating refresh token"
+        raise OrientatiException(message=message, status_code=status_code, details={"message": message})
+    return json_data
+
+
+async def create_token_pair(data: dict, expire_days: int = settings.REFRESH_TOKEN_EXPIRE_DAYS) -> tuple[str, str]:
+    """Crea access e refresh token in parallelo, essendo richieste indipendenti al servizio token.
+
+    Args:
+        data (dict): Dati da includere nel payload di entrambi i token.
+        expire_days (int, optional): Scadenza del refresh token in giorni. Defaults to settings.REFRESH_TOKEN_EXPIRE_DAYS.
+
+    Raises:
+        OrientatiException: La prima eccezione sollevata da una delle due richieste.
+
+    Returns:
+        tuple[str, str]: Access token e refresh token.
+    """
     try:
-        params = HttpParams(data)
-        if expire_days:
-            params.add_param("expires_in", expire_days * 24 * 60)  # Converti giorni in minuti
-
-        json_data, status_code = await send_request(
-            url=HttpUrl.TOKEN_SERVICE,
-            method=HttpMethod.POST,
-            endpoint="/token/create",
-            _params=params
-        )
-        if status_code >= 400:
-            message = json_data.get("message", "Error creating refresh token") if json_data else "Error creating refresh token"
-            raise OrientatiException(message=message, status_code=status_code, details={"message": message})
-        return json_data
-    except OrientatiException as e:
-        raise e
+        async with asyncio.TaskGroup() as tg:
+            access_task = tg.create_task(create_access_token(data))
+            refresh_task = tg.create_task(create_refresh_token(data, expire_days=expire_days))
+    except ExceptionGroup as eg:
+        # Propaga l'eccezione originale (es. OrientatiException) invece del gruppo
+        raise eg.exceptions[0]
+    return access_task.result()["token"], refresh_task.result()["token"]
 
 
 async def create_new_user(data: dict) -> tuple[dict | None, int]:
@@ -142,43 +179,104 @@ async def create_new_user(data: dict) -> tuple[dict | None, int]:
     Returns:
         tuple[dict | None, int]: Dati dell'utente creato e status code.
     """
-    try:
-        params = HttpParams(data)
-        json_data, status_code = await send_request(
-            url=HttpUrl.USERS_SERVICE,
-            method=HttpMethod.POST,
-            endpoint="/users/",
-            _params=params
-        )
-        if status_code >= 400:
-            message = json_data.get("message", "Error creating user") if json_data else "Error creating user"
-            raise OrientatiException(message=message, status_code=status_code, details={"message": message})
-        return json_data, status_code
-    except OrientatiException as e:
-        raise e
+    json_data, status_code = await send_request(
+        url=HttpUrl.USERS_SERVICE,
+        method=HttpMethod.POST,
+        endpoint="/users/",
+        _params=data
+    )
+    if status_code >= 400:
+        message = json_data.get("message", "Error creating user") if json_data else "Error creating user"
+        raise OrientatiException(message=message, status_code=status_code, details={"message": message})
+    return json_data, status_code
 
 
 async def verify_token(token: str) -> dict:
+    json_data, status_code = await send_request(
+        url=HttpUrl.TOKEN_SERVICE,
+        method=HttpMethod.POST,
+        endpoint="/token/verify",
+        _params={"token": token}
+    )
+    if status_code >= 400:
+        # Se il servizio token risponde con 500, lo trattiamo come token non valido (401)
+        # per evitare che il gateway risponda con 500
+        if status_code == 500:
+            logger.warning("Token service returned 500 for token verification. Treating as invalid token. Response: %s", json_data)
+            raise InvalidTokenException("Token verification failed (upstream error)", InvalidTokenErrorType.INVALID_TOKEN)
+        
+        message = json_data.get("message", "Error verifying token") if json_data else "Error verifying token"
+        raise OrientatiException(message=message, status_code=status_code, details={"message": message})
+    return json_data
+
+
+# Chiavi pubbliche del servizio token (kid -> JWK) per la verifica locale dei JWT
+_JWKS: dict[str, dict] = {}
+_JWKS_FETCHED_AT = 0.0
+_JWKS_FORCED_REFRESH_INTERVAL = 60  # Secondi minimi tra due refresh causati da un kid sconosciuto
+_JWKS_LOCK = asyncio.Lock()
+
+
+async def refresh_jwks(force: bool = False) -> None:
+    """Scarica il JWKS del servizio token se la copia locale è scaduta.
+
+    Args:
+        force (bool, optional): Aggiorna anche prima del TTL (es. kid sconosciuto dopo una rotazione),
+            al massimo una volta ogni _JWKS_FORCED_REFRESH_INTERVAL secondi. Defaults to False.
+    """
+    global _JWKS, _JWKS_FETCHED_AT
+    if not settings.TOKEN_JWKS_URL:
+        return
+
+    async with _JWKS_LOCK:
+        max_age = _JWKS_FORCED_REFRESH_INTERVAL if force else settings.TOKEN_JWKS_TTL_SECONDS
+        if _JWKS_FETCHED_AT and time.monotonic() - _JWKS_FETCHED_AT < max_age:
+            return
+        _JWKS_FETCHED_AT = time.monotonic()
+        try:
+            resp = await get_client().get(settings.TOKEN_JWKS_URL)
+            resp.raise_for_status()
+            _JWKS = {key["kid"]: key for key in resp.json().get("keys", []) if "kid" in key}
+            logger.info("Loaded %s JWKS keys from %s", len(_JWKS), settings.TOKEN_JWKS_URL)
+        except Exception as e:
+            logger.warning("Unable to fetch JWKS from %s: %s", settings.TOKEN_JWKS_URL, e)
+
+
+async def verify_token_locally(token: str) -> dict | None:
+    """Verifica firma, scadenza, issuer, audience e tipo del JWT con il JWKS in cache,
+    senza chiamare il servizio token. Lo stato della sessione (revoca) va controllato dal chiamante.
+
+    Args:
+        token (str): Il token da verificare.
+
+    Returns:
+        dict | None: Il payload (con "verified" e "expired" come in verify_token), oppure None se la verifica
+            locale è disattivata o non conclusiva: in quel caso il chiamante deve usare verify_token.
+    """
+    if not (settings.TOKEN_JWKS_URL and settings.TOKEN_JWT_ISSUER and settings.TOKEN_JWT_AUDIENCE):
+        return None
     try:
-        params = HttpParams({"token": token})
-        json_data, status_code = await send_request(
-            url=HttpUrl.TOKEN_SERVICE,
-            method=HttpMethod.POST,
-            endpoint="/token/verify",
-            _params=params
-        )
-        if status_code >= 400:
-            # Se il servizio token risponde con 500, lo trattiamo come token non valido (401)
-            # per evitare che il gateway risponda con 500
-            if status_code == 500:
-                logger.warning(f"Token service returned 500 for token verification. Treating as invalid token. Response: {json_data}")
-                raise InvalidTokenException("Token verification failed (upstream error)", InvalidTokenErrorType.INVALID_TOKEN)
-            
-            message = json_data.get("message", "Error verifying token") if json_data else "Error verifying token"
-            raise OrientatiException(message=message, status_code=status_code, details={"message": message})
-        return json_data
-    except OrientatiException as e:
-        raise e
+        kid = jwt.get_unverified_header(token).get("kid")
+    except JWTError:
+        return None
+
+    await refresh_jwks()
+    if kid not in _JWKS:
+        # Possibile rotazione delle chiavi
+        await refresh_jwks(force=True)
+        if kid not in _JWKS:
+            return None
+
+    try:
+        claims = jwt.decode(token, _JWKS[kid], algorithms=settings.TOKEN_JWT_ALGORITHMS,
+                            issuer=settings.TOKEN_JWT_ISSUER, audience=settings.TOKEN_JWT_AUDIENCE)
+    except JWTError:
+        # Firma, scadenza, issuer o audience non validi: la decisione spetta al servizio token
+        return None
+    if claims.get(settings.TOKEN_JWT_TYPE_CLAIM) != settings.TOKEN_JWT_ACCESS_TOKEN_TYPE:
+        # Refresh token o tipo non riconosciuto: mai accettato come Bearer senza il servizio token
+        return None
+    return {**claims, "verified": True, "expired": False}
 
 
 def verify_password(plain_password: str, hashed_password: str):
@@ -188,64 +286,163 @@ def verify_password(plain_password: str, hashed_password: str):
         return False
 
 
-async def create_user_session_and_tokens(user: User, db: AsyncSession) -> TokenResponse:
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verifica la password in un thread: argon2 è CPU-bound e rilascia il GIL,
+    così l'event loop continua a servire le altre richieste.
+    La durata viene registrata per il login simulato degli utenti inesistenti."""
+    start = time.perf_counter()
+    valid = await asyncio.to_thread(verify_password, plain_password, hashed_password)
+    # Durata vista dal chiamante: sotto carico cresce anche per la coda del thread pool
+    _verify_durations.append(time.perf_counter() - start)
+    return valid
+
+
+async def hash_password_async(password: str) -> str:
+    """Calcola l'hash argon2 della password in un thread, senza bloccare l'event loop."""
+    return await asyncio.to_thread(pwd_context.hash, password)
+
+
+def _verify_budget() -> float:
+    """P99 delle ultime verifiche argon2 reali."""
+    durations = sorted(_verify_durations)
+    return durations[int(0.99 * (len(durations) - 1))]
+
+
+_CALIBRATION_SAMPLES = 3
+
+
+async def calibrate_password_hashing() -> None:
+    """Misura all'avvio hash e verifica argon2 con i parametri configurati: l'hash viene loggato per tarare
+    i costi sull'hardware, le verifiche alimentano la stima usata per gli utenti inesistenti."""
+    start = time.perf_counter()
+    await hash_password_async("benchmark_password")
+    logger.info("Argon2 hash (m=%s KiB, t=%s, p=%s) took %.1f ms", settings.ARGON2_MEMORY_COST,
+                settings.ARGON2_TIME_COST, settings.ARGON2_PARALLELISM, (time.perf_counter() - start) * 1000)
+    for _ in range(_CALIBRATION_SAMPLES):
+        await verify_password_async("benchmark_password", DUMMY_PWD_HASH)
+    logger.info("Argon2 verify budget for unknown users: %.1f ms", _verify_budget() * 1000)
+
+
+async def _simulate_password_verify() -> None:
+    """Attende quanto una verifica argon2 senza eseguirla: le richieste con email inesistenti
+    non consumano né CPU né thread del pool, ma restano indistinguibili nei tempi da una password errata
+    (la stima include già l'attesa in coda delle verifiche reali)."""
+    await asyncio.sleep(_verify_budget())
+
+
+# Statement Core costruiti una volta: niente passaggio dal bulk update ORM (e dalla sincronizzazione
+# della sessione) a ogni logout, e la forma compilata resta nella cache dell'engine
+_EXPIRE_ACCESS_TOKENS = (
+    update(AccessToken.__table__)
+    .where(AccessToken.__table__.c.session_id == bindparam("expired_session_id"))
+    .values(is_expired=True)
+)
+_EXPIRE_REFRESH_TOKENS = (
+    update(RefreshToken.__table__)
+    .where(RefreshToken.__table__.c.session_id == bindparam("expired_session_id"))
+    .values(is_expired=True)
+)
+
+# Select dei flussi di autenticazione costruite una volta con parametri nominati: a ogni richiesta
+# cambiano solo i valori, senza ricostruire l'albero dell'espressione
+_SELECT_LOGIN_USER = (
+    select(User.id, User.hashed_password, User.email_verified)
+    .where(User.email == bindparam("login_email"))
+    .limit(1)
+)
+_SELECT_REFRESH_TOKEN_ROW = (
+    select(RefreshToken, AccessToken, Session)
+    .join(AccessToken, AccessToken.id == RefreshToken.accessToken_id)
+    .outerjoin(Session, Session.id == RefreshToken.session_id)
+    .where(RefreshToken.token == bindparam("refresh_token"))
+)
+_SELECT_SESSION = select(Session).where(Session.id == bindparam("session_id"))
+_SELECT_SESSION_ID = select(Session.id).where(Session.id == bindparam("session_id"))
+_SELECT_SESSION_ACCESS_TOKENS = select(AccessToken.token).where(AccessToken.session_id == bindparam("session_id"))
+
+
+async def expire_session_tokens(session_id: int, db: AsyncSession) -> None:
+    """Segna come scaduti tutti gli access e refresh token della sessione, senza caricarli.
+    Il commit spetta al chiamante, così le modifiche finiscono nella stessa transazione.
+
+    Args:
+        session_id (int): ID della sessione.
+        db (AsyncSession): Sessione DB
     """
-    Crea una sessione per l'utente, genera access e refresh token, li salva nel DB
-    e restituisce un TokenResponse.
+    await db.execute(_EXPIRE_ACCESS_TOKENS, {"expired_session_id": session_id})
+    await db.execute(_EXPIRE_REFRESH_TOKENS, {"expired_session_id": session_id})
+
+
+async def insert_token_pair(session_id: int, access_token: str, refresh_token: str, db: AsyncSession) -> None:
+    """Salva access e refresh token della sessione; il refresh token punta all'access token appena inserito.
+    Il commit spetta al chiamante.
+
+    Args:
+        session_id (int): ID della sessione.
+        access_token (str): Access token da salvare.
+        refresh_token (str): Refresh token da salvare.
+        db (AsyncSession): Sessione DB
     """
-    user_id = user.id
-    db_session = Session(
-        user_id=user_id,
-        expires_at=datetime.now() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    # is_expired esplicito: i default lato Python non si possono calcolare per un INSERT dentro una CTE
+    insert_access_token = (
+        insert(AccessToken)
+        .values(session_id=session_id, token=access_token, is_expired=False)
+        .returning(AccessToken.id)
     )
-    db.add(db_session)
-    await db.commit()
-    await db.refresh(db_session)
-    session_id = db_session.id
+    if db.get_bind().dialect.name == "postgresql":
+        # Un solo statement: INSERT dell'access token in una CTE e INSERT ... SELECT del refresh token
+        at = insert_access_token.cte("inserted_access_token")
+        await db.execute(
+            insert(RefreshToken).from_select(
+                ["session_id", "token", "accessToken_id"],
+                select(literal(session_id), literal(refresh_token), at.c.id)
+            )
+        )
+        return
 
-    access_token_response = await create_access_token(
-        data={"user_id": user_id, "session_id": session_id}
+    # SQLite non supporta INSERT dentro una CTE
+    access_token_id = (await db.execute(insert_access_token)).scalar_one()
+    await db.execute(
+        insert(RefreshToken).values(session_id=session_id, token=refresh_token, accessToken_id=access_token_id)
     )
-    access_token = access_token_response["token"]
 
-    refresh_token_response = await create_refresh_token(
-        data={"user_id": user_id, "session_id": session_id}
-    )
-    refresh_token = refresh_token_response["token"]
 
-    db_access_token = AccessToken(
-        session_id=session_id,
-        token=access_token
-    )
-    db.add(db_access_token)
+async def create_user_session_and_tokens(user_id: int, db: AsyncSession) -> TokenResponse:
+    """
+    Crea una sessione per l'utente, genera access e refresh token, li salva nel DB
+    e restituisce un TokenResponse.
+    """
+    # INSERT ... RETURNING id: gli oggetti ORM non servono, solo gli id generati
+    session_id = (await db.execute(
+        insert(Session)
+        .values(user_id=user_id,
+                expires_at=datetime.now() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS))
+        .returning(Session.id)
+    )).scalar_one()
+    # Commit prima delle chiamate al servizio token: la connessione non resta occupata durante l'I/O HTTP
     await db.commit()
-    await db.refresh(db_access_token)
 
-    db_refresh_token = RefreshToken(
-        session_id=session_id,
-        token=refresh_token,
-        accessToken_id=db_access_token.id
-    )
-    db.add(db_refresh_token)
+    access_token, refresh_token = await create_token_pair({"user_id": user_id, "session_id": session_id})
+
+    await insert_token_pair(session_id, access_token, refresh_token, db)
     await db.commit()
-    await db.refresh(db_refresh_token)
 
     return TokenResponse(status_code=HttpCodes.CREATED.value, access_token=access_token, refresh_token=refresh_token)
 
 
 async def login(user_login: UserLogin, db: AsyncSession) -> TokenResponse:
     try:
-        result = await db.execute(select(User).filter(User.email == user_login.email))
-        user = result.scalars().first()
+        # Solo le colonne usate dal login, senza idratare un oggetto User
+        result = await db.execute(_SELECT_LOGIN_USER, {"login_email": user_login.email})
+        user = result.first()
 
         # Mitigazione attacchi temporali
         password_valid = False
         if user:
-            password_valid = verify_password(user_login.password, user.hashed_password)
+            password_valid = await verify_password_async(user_login.password, user.hashed_password)
         else:
             # Simula la verifica per consumare un tempo simile
-            verify_password(user_login.password, DUMMY_PWD_HASH)
-            password_valid = False
+            await _simulate_password_verify()
 
         # Errore generico per tutti i fallimenti di autenticazione (Non trovato, password errata, non verificato)
         if not user or not password_valid:
@@ -255,11 +452,11 @@ async def login(user_login: UserLogin, db: AsyncSession) -> TokenResponse:
              # Ritorna genericamente 401 anche per email non verificata per prevenire l'enumerazione di utenti "validi ma non verificati"
              raise InvalidCredentialsException()
 
-        return await create_user_session_and_tokens(user, db)
-    except (InvalidCredentialsException, OrientatiException) as e:
-        raise e
+        return await create_user_session_and_tokens(user.id, db)
+    except OrientatiException:
+        raise
     except Exception as e:
-        raise OrientatiException(url="/auth/login", exc=e)
+        raise OrientatiException(url="/auth/login", exc=e) from e
 
 
 async def refresh_token(refresh_token: TokenRequest, db: AsyncSession) -> TokenResponse:
@@ -268,146 +465,99 @@ async def refresh_token(refresh_token: TokenRequest, db: AsyncSession) -> TokenR
         if not payload or not payload["verified"]:
             raise InvalidTokenException("Invalid refresh token", InvalidTokenErrorType.INVALID_TOKEN)
 
-        result_old_token = await db.execute(
-            select(RefreshToken).filter(RefreshToken.token == refresh_token.token).join(AccessToken)
-        )
-        db_old_refresh_token = result_old_token.scalars().first()
-        
-        if not db_old_refresh_token:
+        # Refresh token, access token collegato e sessione con un'unica query
+        result_old_token = await db.execute(_SELECT_REFRESH_TOKEN_ROW, {"refresh_token": refresh_token.token})
+        row = result_old_token.first()
+
+        if not row:
             raise InvalidTokenException("Refresh token not found", InvalidTokenErrorType.TOKEN_NOT_FOUND)
+        db_old_refresh_token, at_related, session = row
 
-        result_session = await db.execute(select(Session).filter(Session.id == db_old_refresh_token.session_id))
-        session = result_session.scalars().first()
-        
         if not session or not session.is_active:
             raise InvalidTokenException("Session is inactive or does not exist", InvalidTokenErrorType.INACTIVE_SESSION)
         if session.is_blocked:
             raise InvalidTokenException("Session is blocked", InvalidTokenErrorType.BLOCKED_SESSION)
-        if session.expires_at < datetime.now():
+        # Un solo istante di riferimento per controllo di scadenza e giorni residui
+        now = datetime.now()
+        if session.expires_at < now:
             raise InvalidTokenException("Session expired", InvalidTokenErrorType.EXPIRED_SESSION)
 
         if db_old_refresh_token.is_expired:
-            # segno la sessione come non attiva e bloccata, perché è stato riusato un token già usato
+            # segno la sessione come non attiva e bloccata, perché è stato riusato un token già usato,
+            # e tutti i token associati come scaduti, in un'unica transazione
             session.is_active = False
             session.is_blocked = True
+            access_tokens = (await db.execute(
+                _SELECT_SESSION_ACCESS_TOKENS, {"session_id": session.id}
+            )).scalars().all()
+            await expire_session_tokens(session.id, db)
             await db.commit()
-            await db.refresh(session)
-            # segno tutti i token associati alla sessione come scaduti
-            # await db.execute(update(AccessToken).where(AccessToken.session_id == session.id).values(is_expired=True))
-            # await db.execute(update(RefreshToken).where(RefreshToken.session_id == session.id).values(is_expired=True))
-            
-            # Recupero tutti i token e li aggiorno uno ad uno o uso update massivo se supportato
-            # Per semplicità nel refactor usiamo query delete/update
-            # In SQLAlchemy async, update requires select or explicit execution.
-            # Facciamo fetch and update per ora o raw update
-            
-            result_access = await db.execute(select(AccessToken).filter(AccessToken.session_id == session.id))
-            for at in result_access.scalars().all():
-                at.is_expired = True
-                
-            result_refresh = await db.execute(select(RefreshToken).filter(RefreshToken.session_id == session.id))
-            for rt in result_refresh.scalars().all():
-                rt.is_expired = True
-
-            await db.commit()
+            # Gli access token della sessione non vengono più accettati, anche se verificati localmente,
+            # e i loro payload escono subito dalla cache
+            await AsyncRedisSingleton().revoke_session(session.id)
+            # Import locale: app.api.deps importa questo modulo
+            from app.api.deps import invalidate_cached_token
+            await invalidate_cached_token(*access_tokens)
 
             raise InvalidTokenException("Refresh token expired, Session blocked", InvalidTokenErrorType.EXPIRED_SESSION)
 
-        access_token_response = await create_access_token(
-            {"user_id": payload["user_id"], "session_id": session.id})
-        refresh_token_response = await create_refresh_token(
-            {"user_id": payload["user_id"], "session_id": session.id},
-            expire_days=(
-                    session.expires_at - datetime.now()).days)
-        access_token = access_token_response["token"]
-        refresh_token = refresh_token_response["token"]
-        # Segno i vecchi token come scaduti
-        db_old_refresh_token.is_expired = True
+        session_id = session.id
+        expire_days = (session.expires_at - now).days
+        # Chiude la transazione di lettura prima delle chiamate al servizio token
         await db.commit()
-        await db.refresh(db_old_refresh_token)
-        
-        # Access token collegato è in db_old_refresh_token.accessToken (se lazy loaded bisogna fare attenzione)
-        # Sarebbe meglio caricare con joinedload se necessario, ma qui proviamo accesso diretto
-        # Se fallisce, bisognerà fare una query separata.
-        # Proviamo a fare query esplicita per evitare lazy load error in async
-        
-        if db_old_refresh_token.accessToken:
-             # Questo potrebbe fallire se non caricato. 
-             # Facciamo query sicura
-             pass
 
-        result_at_related = await db.execute(select(AccessToken).filter(AccessToken.id == db_old_refresh_token.accessToken_id))
-        at_related = result_at_related.scalars().first()
-        if at_related:
-             at_related.is_expired = True
-             await db.commit() # commit parziale
+        access_token, refresh_token = await create_token_pair(
+            {"user_id": payload["user_id"], "session_id": session_id}, expire_days=expire_days)
+
+        # Segno i vecchi token come scaduti
+        db_old_refresh_token.is_expired = True
+        at_related.is_expired = True
 
         # Creo nuovi token
-        db_access_token = AccessToken(
-            session_id=session.id,
-            token=access_token,
-        )
-        db.add(db_access_token)
-        await db.commit()
-        await db.refresh(db_access_token)
-        db_refresh_token = RefreshToken(
-            session_id=session.id,
-            token=refresh_token,
-            accessToken_id=db_access_token.id
-        )
-        db.add(db_refresh_token)
+        await insert_token_pair(session_id, access_token, refresh_token, db)
         await db.commit()
-        await db.refresh(db_refresh_token)
 
         return TokenResponse(status_code=HttpCodes.CREATED.value, access_token=access_token,
                              refresh_token=refresh_token)
-    except (InvalidTokenException, OrientatiException) as e:
-        raise e
+    except OrientatiException:
+        raise
     except Exception as e:
-        raise OrientatiException(url="/auth/refresh", exc=e)
+        raise OrientatiException(url="/auth/refresh", exc=e) from e
 
 
-async def logout(access_token: TokenRequest, db: AsyncSession) -> UserLogout:
+async def logout(access_token: TokenRequest, db: AsyncSession, payload: dict | None = None) -> UserLogout:
     try:
-        payload = await verify_token(access_token.token)
+        # payload già verificato dal chiamante (es. dalla cache dei token), altrimenti lo chiediamo al servizio token
+        if payload is None:
+            payload = await verify_token(access_token.token)
         if not payload or not payload["verified"]:
             raise InvalidTokenException("Invalid access token", InvalidTokenErrorType.INVALID_TOKEN)
 
         if payload["expired"]:
             raise InvalidTokenException("Access token expired0", InvalidTokenErrorType.EXPIRED_SESSION)
 
-        result_session = await db.execute(select(Session).filter(Session.id == payload["session_id"]))
+        result_session = await db.execute(_SELECT_SESSION, {"session_id": payload["session_id"]})
         session = result_session.scalars().first()
 
         if not session:
             raise InvalidSessionException("Session does not exist")
 
-        # Segno la sessione come non attiva
+        # Segno la sessione come non attiva e tutti i token associati come scaduti, con un solo commit
         session.is_active = False
+        await expire_session_tokens(session.id, db)
         await db.commit()
-        await db.refresh(session)
-
-        # Segno tutti i token associati alla sessione come scaduti
-        result_access = await db.execute(select(AccessToken).filter(AccessToken.session_id == session.id))
-        for at in result_access.scalars().all():
-            at.is_expired = True
-            
-        result_refresh = await db.execute(select(RefreshToken).filter(RefreshToken.session_id == session.id))
-        for rt in result_refresh.scalars().all():
-            rt.is_expired = True
-
-        await db.commit()
+        await AsyncRedisSingleton().revoke_session(session.id)
 
         return UserLogout()
-    except (InvalidTokenException, InvalidSessionException, OrientatiException) as e:
-        raise e
+    except OrientatiException:
+        raise
     except Exception as e:
-        raise OrientatiException(url="/auth/logout", exc=e)
+        raise OrientatiException(url="/auth/logout", exc=e) from e
 
 
-async def register(user: UserRegistration, db: AsyncSession) -> None:
+async def register(user: UserRegistration) -> None:
     try:
-        hashed_password = pwd_context.hash(user.password)
+        hashed_password = await hash_password_async(user.password)
 
         create_user_response, status_code = await create_new_user(
             data={"name": user.name, "surname": user.surname, "email": user.email,
@@ -433,15 +583,16 @@ async def register(user: UserRegistration, db: AsyncSession) -> None:
             updated_at=datetime.fromisoformat(create_user_response["updated_at"]),
             email_verified=False
         )
-        db.add(user_local)
-        await db.commit()
-        await db.refresh(user_local)
-        
+        # La sessione DB viene aperta solo qui: nel caso asincrono (202) la richiesta non tocca il database
+        async with AsyncSessionLocal() as db:
+            db.add(user_local)
+            await db.commit()
+
         return None
-    except OrientatiException as e:
-        raise e
+    except OrientatiException:
+        raise
     except Exception as e:
-        raise OrientatiException(url="/auth/register", exc=e)
+        raise OrientatiException(url="/auth/register", exc=e) from e
 
 
 # TODO: Aggiungere job per pulizia sessioni e token scaduti
@@ -467,24 +618,22 @@ async def validate_session(access_token: str, db: AsyncSession) -> None:
 
         if payload["expired"]:
             # Segna il token come scaduto
-            result_session = await db.execute(select(Session).filter(Session.id == payload["session_id"]))
-            session = result_session.scalars().first()
-            
-            if session:
-                # Segna il token access come scaduto
-                result_at = await db.execute(select(AccessToken).filter(AccessToken.session_id == session.id))
-                for at in result_at.scalars().all():
-                     at.is_expired = True
+            session_id = (await db.execute(
+                _SELECT_SESSION_ID, {"session_id": payload["session_id"]}
+            )).scalar_one_or_none()
 
+            if session_id is not None:
+                # Segna gli access token della sessione come scaduti con un solo UPDATE lato server
+                await db.execute(_EXPIRE_ACCESS_TOKENS, {"expired_session_id": session_id})
                 await db.commit()
                 raise InvalidTokenException("Access token expired", InvalidTokenErrorType.EXPIRED_SESSION)
             else:
                 raise InvalidTokenException("Access token is of an expired session",
                                             InvalidTokenErrorType.EXPIRED_SESSION)
-    except (InvalidTokenException, OrientatiException) as e:
-        raise e
+    except OrientatiException:
+        raise
     except Exception as e:
-        raise OrientatiException(url="/auth/validate_session", exc=e)
+        raise OrientatiException(url="/auth/validate_session", exc=e) from e
 
 
 async def get_session_id_from_token(access_token: str) -> str:
@@ -499,25 +648,26 @@ async def get_session_id_from_token(access_token: str) -> str:
     Returns:
         str: L'ID della sessione associata al token di accesso.
     """
-    try:
-        payload = await verify_token(access_token)
-        if not payload or not payload["verified"]:
-            raise InvalidTokenException("Invalid access token", InvalidTokenErrorType.INVALID_TOKEN)
-        return payload["session_id"]
-    except Exception as e:
-        raise e
+    payload = await verify_token(access_token)
+    if not payload or not payload["verified"]:
+        raise InvalidTokenException("Invalid access token", InvalidTokenErrorType.INVALID_TOKEN)
+    return payload["session_id"]
 
 
-async def handle_session_revocation(message_data: dict):
+async def handle_session_revocation(message):
     """
     Gestisce l'evento di revoca della sessione da RabbitMQ.
-    Expected data: {"user_id": "...", "reason": "..."}
+    Expected body: {"user_id": "...", "reason": "..."}
+    Rimuove anche i payload dei token dell'utente dalla cache condivisa, così validate_token
+    torna a verificarli col servizio token.
     """
-    user_id = message_data.get("user_id")
-    if not user_id:
-        logger.warning("Revocation event received without user_id")
-        return
-
-    logger.info(f"Processing session revocation for user {user_id}")
-    redis_service = AsyncRedisSingleton()
-    await redis_service.revoke_user_sessions(user_id)
+    async with message.process():
+        message_data = json.loads(message.body)
+        user_id = message_data.get("user_id")
+        if not user_id:
+            logger.warning("Revocation event received without user_id")
+            return
+
+        logger.info("Processing session revocation for user %s", user_id)
+        redis_service = AsyncRedisSingleton()
+        await redis_service.revoke_user_sessions(user_id)
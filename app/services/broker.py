@@ -63,14 +63,14 @@ class AsyncBrokerSingleton:
                     password=settings.RABBITMQ_PASS
                 )
                 self.channel = await self.connection.channel()
-                logger.info(f"Connected to RabbitMQ at {settings.RABBITMQ_HOST}:{settings.RABBITMQ_PORT} (attempt {attempt})")
+                logger.info("Connected to RabbitMQ at %s:%s (attempt %s)", settings.RABBITMQ_HOST, settings.RABBITMQ_PORT, attempt)
                 return True
             except Exception as e:
-                logger.warning(f"Connection attempt {attempt}/{retries} failed: {e}")
+                logger.warning("Connection attempt %s/%s failed: %s", attempt, retries, e)
                 if attempt < retries:
                     await asyncio.sleep(delay)
                 else:
-                    logger.error(f"Failed to connect to RabbitMQ after {retries} attempts")
+                    logger.error("Failed to connect to RabbitMQ after %s attempts", retries)
         
         return False
 
@@ -97,8 +97,8 @@ class AsyncBrokerSingleton:
 
         self.queues[queue_name] = queue
         self.consumer_tags[queue_name] = consumer_tag
-        logger.info(
-            f"Subscribed to exchange {exchange_name} with queue '{queue_name}' and routing key '{routing_key}' (aio-pika)")
+        logger.info("Subscribed to exchange %s with queue '%s' and routing key '%s' (aio-pika)",
+                    exchange_name, queue_name, routing_key)
 
     async def unsubscribe(self, queue_name):
         """Annulla la sottoscrizione a una coda RabbitMQ (asincrono).
@@ -116,7 +116,7 @@ class AsyncBrokerSingleton:
             # await self.queues[queue_name].unbind() # Requires exchange object, skipping for now
             # await self.queues[queue_name].delete() # Opzionale: decidi se cancellare la coda
             del self.queues[queue_name]
-        logger.info(f"Unsubscribed from queue '{queue_name}' (aio-pika)")
+        logger.info("Unsubscribed from queue '%s' (aio-pika)", queue_name)
 
     async def publish_message(self, exchange_name, msg_type, data, routing_key=""):
         """Pubblica un messaggio su un exchange RabbitMQ (asincrono).
@@ -137,8 +137,8 @@ class AsyncBrokerSingleton:
             delivery_mode=aio_pika.DeliveryMode.PERSISTENT
         )
         await exchange.publish(message, routing_key=routing_key)
-        logger.info(
-            f"Messaggio inviato all'exchange {exchange_name}. Tipo: {msg_type}, Routing key: {routing_key} (aio-pika)")
+        logger.info("Messaggio inviato all'exchange %s. Tipo: %s, Routing key: %s (aio-pika)",
+                    exchange_name, msg_type, routing_key)
 
     async def close(self):
         """Chiude la connessione a RabbitMQ e annulla tutte le sottoscrizioni (asincrono)."""
@@ -1,8 +1,13 @@
-from app.schemas.citta import CittaList, CittaResponse, CittaCreate, CittaUpdate
-from app.services.http_client import HttpMethod, HttpUrl, HttpParams, send_request
+import json
 
+from app.schemas.citta import CittaResponse, CittaCreate, CittaUpdate
+from app.services.http_client import OrientatiException, HttpMethod, HttpUrl, HttpParams, send_request
+from app.services import response_cache
 
-async def get_citta(limit, offset, search, sort_by, order) -> CittaList:
+CACHE_NAMESPACE = "citta"
+
+
+async def get_citta(limit, offset, search, sort_by, order) -> dict:
     """
     Recupera la lista delle città disponibili.
     Args:
@@ -12,7 +17,7 @@ async def get_citta(limit, offset, search, sort_by, order) -> CittaList:
         sort_by (str | None): Campo per ordinamento (es. nome).
         order (str | None): Ordine: 'asc' o 'desc'.
     Returns:
-        CittaList: Lista delle città con metadati di paginazione.
+        dict: Lista delle città con metadati di paginazione.
     """
     try:
         params = {
@@ -25,21 +30,25 @@ async def get_citta(limit, offset, search, sort_by, order) -> CittaList:
         # Rimuovo i parametri None
         params = {k: v for k, v in params.items() if v is not None}
 
-        response, status_code = await send_request(
-            method=HttpMethod.GET,
-            url=HttpUrl.SCHOOLS_SERVICE,
-            endpoint="/citta",
-            _params=HttpParams(params)
-        )
-        if status_code >= 400:
-            raise OrientatiException(message=response.get("message", "Error getting citta"), status_code=status_code, details=response)
+        cache_key = f"list:{json.dumps(params, sort_keys=True)}"
+
+        async def fetch():
+            response, status_code = await send_request(
+                method=HttpMethod.GET,
+                url=HttpUrl.SCHOOLS_SERVICE,
+                endpoint="/citta",
+                _params=HttpParams(params)
+            )
+            if status_code >= 400:
+                raise OrientatiException(message=response.get("message", "Error getting citta"), status_code=status_code, details=response)
+            return response
 
-        return CittaList(**response)
+        return await response_cache.get_or_fetch(CACHE_NAMESPACE, cache_key, fetch)
     except Exception as e:
         raise e
 
 
-async def get_citta_by_id(citta_id: int) -> CittaResponse:
+async def get_citta_by_id(citta_id: int) -> dict:
     """
     Recupera i dettagli di una città dato il suo ID.
 
@@ -47,23 +56,27 @@ async def get_citta_by_id(citta_id: int) -> CittaResponse:
         citta_id (int): ID della città da recuperare
 
     Returns:
-        CittaResponse: Dettagli della città
+        dict: Dettagli della città
     """
     try:
-        response, status_code = await send_request(
-            method=HttpMethod.GET,
-            url=HttpUrl.SCHOOLS_SERVICE,
-            endpoint=f"/citta/{citta_id}"
-        )
-        if status_code >= 400:
-            raise OrientatiException(message=response.get("message", "Error getting citta"), status_code=status_code, details=response)
-
-        return CittaResponse(**response)
+        cache_key = f"id:{citta_id}"
+
+        async def fetch():
+            response, status_code = await send_request(
+                method=HttpMethod.GET,
+                url=HttpUrl.SCHOOLS_SERVICE,
+                endpoint=f"/citta/{citta_id}"
+            )
+            if status_code >= 400:
+                raise OrientatiException(message=response.get("message", "Error getting citta"), status_code=status_code, details=response)
+            return response
+
+        return await response_cache.get_or_fetch(CACHE_NAMESPACE, cache_key, fetch)
     except Exception as e:
         raise e
 
 
-async def get_citta_by_zipcode(zipcode: str) -> CittaResponse:
+async def get_citta_by_zipcode(zipcode: str) -> dict:
     """
     Recupera i dettagli di una città dato il suo CAP.
 
@@ -71,23 +84,27 @@ async def get_citta_by_zipcode(zipcode: str) -> CittaResponse:
         zipcode (str): CAP della città da recuperare
 
     Returns:
-        CittaResponse: Dettagli della città
+        dict: Dettagli della città
     """
     try:
-        response, status_code = await send_request(
-            method=HttpMethod.GET,
-            url=HttpUrl.SCHOOLS_SERVICE,
-            endpoint=f"/citta/zipcode/{zipcode}"
-        )
-        if status_code >= 400:
-            raise OrientatiException(message=response.get("message", "Error getting citta by zipcode"), status_code=status_code, details=response)
-
-        return CittaResponse(**response)
+        cache_key = f"zipcode:{zipcode}"
+
+        async def fetch():
+            response, status_code = await send_request(
+                method=HttpMethod.GET,
+                url=HttpUrl.SCHOOLS_SERVICE,
+                endpoint=f"/citta/zipcode/{zipcode}"
+            )
+            if status_code >= 400:
+                raise OrientatiException(message=response.get("message", "Error getting citta by zipcode"), status_code=status_code, details=response)
+            return response
+
+        return await response_cache.get_or_fetch(CACHE_NAMESPACE, cache_key, fetch)
     except Exception as e:
         raise e
 
 
-async def post_citta(citta: CittaCreate) -> CittaResponse:
+async def post_citta(citta: CittaCreate) -> dict:
     """
     Crea una nuova città.
 
@@ -95,7 +112,7 @@ async def post_citta(citta: CittaCreate) -> CittaResponse:
         citta (CittaCreate): Dati della città da creare
 
     Returns:
-        CittaResponse: Dettagli della città creata
+        dict: Dettagli della città creata
     """
     try:
         response, status_code = await send_request(
@@ -106,13 +123,14 @@ async def post_citta(citta: CittaCreate) -> CittaResponse:
         )
         if status_code >= 400:
             raise OrientatiException(message=response.get("message", "Error creating citta"), status_code=status_code, details=response)
+        await response_cache.invalidate_cached_responses(CACHE_NAMESPACE)
 
-        return CittaResponse(**response)
+        return response
     except Exception as e:
         raise e
 
 
-async def put_citta(citta_id: int, citta: CittaUpdate) -> CittaResponse:
+async def put_citta(citta_id: int, citta: CittaUpdate) -> dict:
     """
     Aggiorna i dettagli di una città esistente.
 
@@ -121,7 +139,7 @@ async def put_citta(citta_id: int, citta: CittaUpdate) -> CittaResponse:
         citta (CittaUpdate): Dati aggiornati della città
 
     Returns:
-        CittaResponse: Dettagli della città aggiornata
+        dict: Dettagli della città aggiornata
     """
     try:
         response, status_code = await send_request(
@@ -132,8 +150,9 @@ async def put_citta(citta_id: int, citta: CittaUpdate) -> CittaResponse:
         )
         if status_code >= 400:
             raise OrientatiException(message=response.get("message", "Error updating citta"), status_code=status_code, details=response)
+        await response_cache.invalidate_cached_responses(CACHE_NAMESPACE)
 
-        return CittaResponse(**response)
+        return response
     except Exception as e:
         raise e
 
@@ -156,6 +175,7 @@ async def delete_citta(citta_id: int) -> CittaResponse:
         )
         if status_code >= 400:
             raise OrientatiException(message=response.get("message", "Error deleting citta"), status_code=status_code, details=response)
+        await response_cache.invalidate_cached_responses(CACHE_NAMESPACE)
 
         return CittaResponse(**response)
     except Exception as e:
@@ -1,9 +1,11 @@
 from __future__ import annotations
 
+import logging
 import traceback
 from enum import Enum
 
 import httpx
+import orjson
 
 from app.core.config import settings
 from app.core.logging import get_logger
@@ -123,22 +125,51 @@ class OrientatiException(Exception):
         self.details = details if details is not None else {"message": "Internal Server Error"}
         self.url = url
         if self.status_code >= 500:
+            # Lo stack viene formattato solo se il record verrà effettivamente emesso
+            if not logger.isEnabledFor(logging.ERROR):
+                return
             caller_stack = "".join(traceback.format_stack()[:-1])
             logger.error("ERRORE!\n")
-            logger.error(f"Stack del richiamante:\n{caller_stack}")
+            logger.error("Stack del richiamante:\n%s", caller_stack)
             if exc is not None:
                 exc_tb = "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
-                logger.error(f"ECCEZIONE ORIGINALE:\n{exc_tb}")
+                logger.error("ECCEZIONE ORIGINALE:\n%s", exc_tb)
         else:
-            logger.warning(f"OrientatiException: {self.message} (Status: {self.status_code}) - URL: {self.url}")
+            logger.warning("OrientatiException: %s (Status: %s) - URL: %s", self.message, self.status_code, self.url)
             
             
 async_client: httpx.AsyncClient | None = None
 
 
+def _build_client() -> httpx.AsyncClient:
+    # Pool di connessioni keep-alive condiviso verso i microservizi: evita un nuovo handshake TCP per richiesta.
+    # I retry del transport ripetono solo la connessione fallita, mai una richiesta già inviata.
+    transport = httpx.AsyncHTTPTransport(
+        retries=settings.HTTP_CONNECT_RETRIES,
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+        ),
+    )
+    return httpx.AsyncClient(
+        transport=transport,
+        timeout=httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS, connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS),
+        follow_redirects=True,
+    )
+
+
 async def init_client():
     global async_client
-    async_client = httpx.AsyncClient(timeout=5.0, follow_redirects=True)
+    async_client = _build_client()
+
+
+def get_client() -> httpx.AsyncClient:
+    """Restituisce il client HTTP condiviso, creandolo se non è stato inizializzato (es. test o script)."""
+    global async_client
+    if async_client is None:
+        async_client = _build_client()
+    return async_client
 
 
 async def close_client():
@@ -148,7 +179,7 @@ async def close_client():
         async_client = None
 
 
-async def send_request(url: HttpUrl, method: HttpMethod, endpoint: str, _params: HttpParams = None,
+async def send_request(url: HttpUrl, method: HttpMethod, endpoint: str, _params: HttpParams | dict = None,
                        _headers: HttpHeaders = None) -> tuple[dict | None, int]:
     """Gestisce la risposta della richiesta HTTP.
 
@@ -159,7 +190,8 @@ async def send_request(url: HttpUrl, method: HttpMethod, endpoint: str, _params:
         url (HttpUrl): Base URL del servizio.
         method (HttpMethod): Metodo HTTP da utilizzare.
         endpoint (str): Endpoint specifico del servizio.
-        _params (HttpParams, optional): Parametri della query. Defaults to None.
+        _params (HttpParams | dict, optional): Parametri della query; un dict viene usato così com'è, senza copia.
+            Defaults to None.
         _headers (HttpHeaders, optional): Headers della richiesta. Defaults to None.
 
     Raises:
@@ -167,30 +199,30 @@ async def send_request(url: HttpUrl, method: HttpMethod, endpoint: str, _params:
     Returns:
         tuple[dict | None, int]: Una tupla contenente la risposta JSON (o None) e il codice di stato HTTP.
     """
-    global async_client
-    if async_client is None:
-        # Fallback se il client non è stato inizializzato (es. test o script)
-        async_client = httpx.AsyncClient(timeout=5.0, follow_redirects=True)
+    client = get_client()
 
     full_url = f"{url.value}{API_PREFIX}{endpoint}"
     if not full_url.endswith("/") and _params is None:
         full_url += "/"
 
     headers = _headers.to_dict() if _headers else HttpHeaders().to_dict()
-    params = _params.to_dict() if _params else {}
+    if isinstance(_params, HttpParams):
+        params = _params.to_dict()
+    else:
+        params = _params or {}
 
     try:
         match method:
             case HttpMethod.GET:
-                resp = await async_client.get(full_url, headers=headers, params=params)
+                resp = await client.get(full_url, headers=headers, params=params)
             case HttpMethod.POST:
-                resp = await async_client.post(full_url, headers=headers, json=params)
+                resp = await client.post(full_url, headers=headers, content=orjson.dumps(params))
             case HttpMethod.PUT:
-                resp = await async_client.put(full_url, headers=headers, json=params)
+                resp = await client.put(full_url, headers=headers, content=orjson.dumps(params))
             case HttpMethod.DELETE:
-                resp = await async_client.delete(full_url, headers=headers)
+                resp = await client.delete(full_url, headers=headers)
             case HttpMethod.PATCH:
-                resp = await async_client.patch(full_url, headers=headers, json=params)
+                resp = await client.patch(full_url, headers=headers, content=orjson.dumps(params))
             case _:
                 raise ValueError(f"Unsupported HTTP method: {method}")
     except httpx.HTTPError as e:
@@ -202,7 +234,7 @@ async def send_request(url: HttpUrl, method: HttpMethod, endpoint: str, _params:
         json_body = {}
         try:
             if resp.content:
-                json_body = resp.json()
+                json_body = orjson.loads(resp.content)
                 logger.info(json_body)
         except Exception:
             pass
@@ -231,11 +263,11 @@ async def send_request(url: HttpUrl, method: HttpMethod, endpoint: str, _params:
     json_data = None
     try:
         if resp.content:
-             json_data = resp.json()
+             json_data = orjson.loads(resp.content)
     except Exception as e:
         # Se non è un JSON valido ma lo status è ok, potrebbe essere voluto (es. 204 No Content)
         # Ma se lo status è errore e non è json, logghiamo o gestiamo
-        logger.warning(f"Failed to parse JSON response from {full_url}: {e}")
+        logger.warning("Failed to parse JSON response from %s: %s", full_url, e)
         # Non raisiamo eccezione qui, ritorniamo None come data e lasciamo gestire al chiamante
         pass
 
@@ -1,8 +1,13 @@
-from app.schemas.indirizzo import IndirizzoList, IndirizzoResponse, IndirizzoCreate, IndirizzoUpdate
+import json
+
+from app.schemas.indirizzo import IndirizzoCreate, IndirizzoUpdate
 from app.services.http_client import OrientatiException, HttpMethod, HttpUrl, HttpParams, send_request
+from app.services import response_cache
+
+CACHE_NAMESPACE = "indirizzi"
 
 
-async def get_indirizzi(limit, offset, search, sort_by, order) -> IndirizzoList:
+async def get_indirizzi(limit, offset, search, sort_by, order) -> dict:
     """
     Recupera una lista di indirizzi di studio con supporto per paginazione, ricerca e ordinamento.
     Args:
@@ -12,7 +17,7 @@ async def get_indirizzi(limit, offset, search, sort_by, order) -> IndirizzoList:
         sort_by (str | None): Campo per ordinamento (es. nome).
         order (str | None): Ordine: 'asc' o 'desc'.
     Returns:
-        IndirizzoList: Lista degli indirizzi di studio con metadati di paginazione.
+        dict: Lista degli indirizzi di studio con metadati di paginazione.
     """
     try:
         params = {
@@ -25,16 +30,20 @@ async def get_indirizzi(limit, offset, search, sort_by, order) -> IndirizzoList:
         # Rimuovo i parametri None
         params = {k: v for k, v in params.items() if v is not None}
 
-        response, status_code = await send_request(
-            method=HttpMethod.GET,
-            url=HttpUrl.SCHOOLS_SERVICE,
-            endpoint="/indirizzi",
-            _params=HttpParams(params)
-        )
-        if status_code >= 400:
-            raise OrientatiException(message=response.get("message", "Error getting indirizzi"), status_code=status_code, details=response)
+        cache_key = f"list:{json.dumps(params, sort_keys=True)}"
 
-        return IndirizzoList(**response)
+        async def fetch():
+            response, status_code = await send_request(
+                method=HttpMethod.GET,
+                url=HttpUrl.SCHOOLS_SERVICE,
+                endpoint="/indirizzi",
+                _params=HttpParams(params)
+            )
+            if status_code >= 400:
+                raise OrientatiException(message=response.get("message", "Error getting indirizzi"), status_code=status_code, details=response)
+            return response
+
+        return await response_cache.get_or_fetch(CACHE_NAMESPACE, cache_key, fetch)
 
     except OrientatiException as e:
         raise e
@@ -42,24 +51,28 @@ async def get_indirizzi(limit, offset, search, sort_by, order) -> IndirizzoList:
         raise OrientatiException(url="/indirizzi/get", exc=e)
 
 
-async def get_indirizzo_by_id(indirizzo_id: int) -> IndirizzoResponse:
+async def get_indirizzo_by_id(indirizzo_id: int) -> dict:
     """
     Recupera i dettagli di un indirizzo di studio dato il suo ID.
     Args:
         indirizzo_id (int): ID dell'indirizzo di studio da recuperare.
     Returns:
-        IndirizzoResponse: Dettagli dell'indirizzo di studio.
+        dict: Dettagli dell'indirizzo di studio.
     """
     try:
-        response, status_code = await send_request(
-            method=HttpMethod.GET,
-            url=HttpUrl.SCHOOLS_SERVICE,
-            endpoint=f"/indirizzi/{indirizzo_id}"
-        )
-        if status_code >= 400:
-            raise OrientatiException(message=response.get("message", "Error getting indirizzo"), status_code=status_code, details=response)
+        cache_key = f"id:{indirizzo_id}"
+
+        async def fetch():
+            response, status_code = await send_request(
+                method=HttpMethod.GET,
+                url=HttpUrl.SCHOOLS_SERVICE,
+                endpoint=f"/indirizzi/{indirizzo_id}"
+            )
+            if status_code >= 400:
+                raise OrientatiException(message=response.get("message", "Error getting indirizzo"), status_code=status_code, details=response)
+            return response
 
-        return IndirizzoResponse(**response)
+        return await response_cache.get_or_fetch(CACHE_NAMESPACE, cache_key, fetch)
 
     except OrientatiException as e:
         raise e
@@ -67,13 +80,13 @@ async def get_indirizzo_by_id(indirizzo_id: int) -> IndirizzoResponse:
         raise OrientatiException(url=f"/indirizzi/{indirizzo_id}", exc=e)
 
 
-async def post_indirizzo(indirizzo_data: IndirizzoCreate) -> IndirizzoResponse:
+async def post_indirizzo(indirizzo_data: IndirizzoCreate) -> dict:
     """
     Crea un nuovo indirizzo di studio.
     Args:
         indirizzo_data (IndirizzoCreate): Dati dell'indirizzo di studio da creare.
     Returns:
-        IndirizzoResponse: Dettagli dell'indirizzo di studio creato.
+        dict: Dettagli dell'indirizzo di studio creato.
     """
     try:
         response, status_code = await send_request(
@@ -84,8 +97,9 @@ async def post_indirizzo(indirizzo_data: IndirizzoCreate) -> IndirizzoResponse:
         )
         if status_code >= 400:
             raise OrientatiException(message=response.get("message", "Error creating indirizzo"), status_code=status_code, details=response)
+        await response_cache.invalidate_cached_responses(CACHE_NAMESPACE)
 
-        return IndirizzoResponse(**response)
+        return response
 
     except OrientatiException as e:
         raise e
@@ -93,14 +107,14 @@ async def post_indirizzo(indirizzo_data: IndirizzoCreate) -> IndirizzoResponse:
         raise OrientatiException(url="/indirizzi/post", exc=e)
 
 
-async def put_indirizzo(indirizzo_id: int, indirizzo_data: IndirizzoUpdate) -> IndirizzoResponse:
+async def put_indirizzo(indirizzo_id: int, indirizzo_data: IndirizzoUpdate) -> dict:
     """
     Aggiorna i dettagli di un indirizzo di studio esistente.
     Args:
         indirizzo_id (int): ID dell'indirizzo di studio da aggiornare.
         indirizzo_data (IndirizzoUpdate): Dati aggiornati dell'indirizzo di studio.
     Returns:
-        IndirizzoResponse: Dettagli dell'indirizzo di studio aggiornato.
+        dict: Dettagli dell'indirizzo di studio aggiornato.
     """
     try:
         response, status_code = await send_request(
@@ -111,8 +125,9 @@ async def put_indirizzo(indirizzo_id: int, indirizzo_data: IndirizzoUpdate) -> I
         )
         if status_code >= 400:
             raise OrientatiException(message=response.get("message", "Error updating indirizzo"), status_code=status_code, details=response)
+        await response_cache.invalidate_cached_responses(CACHE_NAMESPACE)
 
-        return IndirizzoResponse(**response)
+        return response
 
     except OrientatiException as e:
         raise e
@@ -136,6 +151,7 @@ async def delete_indirizzo(indirizzo_id: int) -> None:
         )
         if status_code >= 400:
             raise OrientatiException(message=response.get("message", "Error deleting indirizzo"), status_code=status_code, details=response)
+        await response_cache.invalidate_cached_responses(CACHE_NAMESPACE)
 
     except OrientatiException as e:
         raise e
@@ -1,11 +1,17 @@
+import json
+
 from app.core.logging import get_logger
-from app.schemas.materia import MateriaList, MateriaResponse, MateriaCreate, MateriaUpdate
+from app.schemas.materia import MateriaCreate, MateriaUpdate
 from app.services.http_client import OrientatiException, HttpMethod, HttpUrl, HttpParams, send_request
+from app.services.indirizzi import CACHE_NAMESPACE as INDIRIZZI_CACHE_NAMESPACE
+from app.services import response_cache
 
 logger = get_logger(__name__)
 
+CACHE_NAMESPACE = "materie"
+
 
-async def get_materie(limit, offset, search, sort_by, order) -> MateriaList:
+async def get_materie(limit, offset, search, sort_by, order) -> dict:
     """
     Recupera la lista delle materie con opzioni di paginazione e filtro.
     Args:
@@ -15,7 +21,7 @@ async def get_materie(limit, offset, search, sort_by, order) -> MateriaList:
         sort_by (str | None): Campo per ordinamento (es. nome).
         order (str | None): Ordine: 'asc' o 'desc'.
     Returns:
-        MateriaList: Lista delle materie con metadati di paginazione.
+        dict: Lista delle materie con metadati di paginazione.
     """
     try:
         params = {
@@ -28,16 +34,20 @@ async def get_materie(limit, offset, search, sort_by, order) -> MateriaList:
         # Rimuovo i parametri None
         params = {k: v for k, v in params.items() if v is not None}
 
-        response, status_code = await send_request(
-            method=HttpMethod.GET,
-            url=HttpUrl.SCHOOLS_SERVICE,
-            endpoint="/materie",
-            _params=HttpParams(params)
-        )
-        if status_code >= 400:
-            raise OrientatiException(message=response.get("message", "Error getting materie"), status_code=status_code, details=response)
+        cache_key = f"list:{json.dumps(params, sort_keys=True)}"
+
+        async def fetch():
+            response, status_code = await send_request(
+                method=HttpMethod.GET,
+                url=HttpUrl.SCHOOLS_SERVICE,
+                endpoint="/materie",
+                _params=HttpParams(params)
+            )
+            if status_code >= 400:
+                raise OrientatiException(message=response.get("message", "Error getting materie"), status_code=status_code, details=response)
+            return response
 
-        return MateriaList(**response)
+        return await response_cache.get_or_fetch(CACHE_NAMESPACE, cache_key, fetch)
 
     except OrientatiException as e:
         raise e
@@ -51,30 +61,35 @@ async def get_materia_by_id(materia_id: int):
     Args:
         materia_id (int): ID della materia da recuperare
     Returns:
-        MateriaResponse: Dettagli della materia
+        dict: Dettagli della materia
     """
     try:
-        response, status_code = await send_request(
-            method=HttpMethod.GET,
-            url=HttpUrl.SCHOOLS_SERVICE,
-            endpoint=f"/materie/{materia_id}"
-        )
-        if status_code >= 400:
-            raise OrientatiException(message=response.get("message", "Error getting materia"), status_code=status_code, details=response)
-        return response
+        cache_key = f"id:{materia_id}"
+
+        async def fetch():
+            response, status_code = await send_request(
+                method=HttpMethod.GET,
+                url=HttpUrl.SCHOOLS_SERVICE,
+                endpoint=f"/materie/{materia_id}"
+            )
+            if status_code >= 400:
+                raise OrientatiException(message=response.get("message", "Error getting materia"), status_code=status_code, details=response)
+            return response
+
+        return await response_cache.get_or_fetch(CACHE_NAMESPACE, cache_key, fetch)
     except OrientatiException as e:
         raise e
     except Exception as e:
         raise OrientatiException(url=f"/materie/{materia_id}", exc=e)
 
 
-async def post_materia(materia: MateriaCreate) -> MateriaResponse:
+async def post_materia(materia: MateriaCreate) -> dict:
     """
     Crea una nuova materia.
     Args:
         materia (MateriaCreate): Dati della materia da creare
     Returns:
-        MateriaResponse: Dettagli della materia creata
+        dict: Dettagli della materia creata
     """
     try:
         response, status_code = await send_request(
@@ -85,21 +100,22 @@ async def post_materia(materia: MateriaCreate) -> MateriaResponse:
         )
         if status_code >= 400:
             raise OrientatiException(message=response.get("message", "Error creating materia"), status_code=status_code, details=response)
-        return MateriaResponse(**response)
+        await response_cache.invalidate_cached_responses(CACHE_NAMESPACE)
+        return response
     except OrientatiException as e:
         raise e
     except Exception as e:
         raise OrientatiException(url="/materie/post", exc=e)
 
 
-async def put_materia(materia_id: int, materia: MateriaUpdate) -> MateriaResponse:
+async def put_materia(materia_id: int, materia: MateriaUpdate) -> dict:
     """
     Aggiorna i dettagli di una materia esistente.
     Args:
         materia_id (int): ID della materia da aggiornare
         materia (MateriaUpdate): Dati aggiornati della materia
     Returns:
-        MateriaResponse: Dettagli della materia aggiornata
+        dict: Dettagli della materia aggiornata
     """
     try:
         response, status_code = await send_request(
@@ -110,7 +126,8 @@ async def put_materia(materia_id: int, materia: MateriaUpdate) -> MateriaRespons
         )
         if status_code >= 400:
             raise OrientatiException(message=response.get("message", "Error updating materia"), status_code=status_code, details=response)
-        return MateriaResponse(**response)
+        await response_cache.invalidate_cached_responses(CACHE_NAMESPACE)
+        return response
     except OrientatiException as e:
         raise e
     except Exception as e:
@@ -131,6 +148,7 @@ async def delete_materia(materia_id: int):
         )
         if status_code >= 400:
             raise OrientatiException(message=response.get("message", "Error deleting materia"), status_code=status_code, details=response)
+        await response_cache.invalidate_cached_responses(CACHE_NAMESPACE)
         return response
     except OrientatiException as e:
         raise e
@@ -156,6 +174,9 @@ async def link_materia_to_indirizzo(materia_id: int, indirizzo_id: int) -> dict:
         )
         if status_code >= 400:
             raise OrientatiException(message=response.get("message", "Error linking materia"), status_code=status_code, details=response)
+        await response_cache.invalidate_cached_responses(CACHE_NAMESPACE)
+        # Il collegamento cambia anche le materie esposte dagli indirizzi
+        await response_cache.invalidate_cached_responses(INDIRIZZI_CACHE_NAMESPACE)
 
         return response
 
@@ -183,6 +204,9 @@ async def unlink_materia_from_indirizzo(materia_id: int, indirizzo_id: int):
         )
         if status_code >= 400:
             raise OrientatiException(message=response.get("message", "Error unlinking materia"), status_code=status_code, details=response)
+        await response_cache.invalidate_cached_responses(CACHE_NAMESPACE)
+        # Il collegamento cambia anche le materie esposte dagli indirizzi
+        await response_cache.invalidate_cached_responses(INDIRIZZI_CACHE_NAMESPACE)
 
         return response
 
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 import asyncio
-import json
+import time
 from typing import Optional, Any
 
+import orjson
 import redis.asyncio as redis
 from redis.asyncio.client import Redis
 from redis.exceptions import ConnectionError, TimeoutError
@@ -14,6 +15,15 @@ from app.core.logging import get_logger
 logger = get_logger(__name__)
 
 
+# Le revoche servono solo finché un access token già emesso può essere ancora valido
+_REVOCATION_TTL_SECONDS = settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+
+def _dumps(data: Any) -> bytes:
+    """Serializza in JSON con orjson; come json.dumps accetta chiavi non stringa (es. id interi)."""
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+
 class AsyncRedisSingleton:
     """Singleton asincrono per la gestione di Redis."""
     _instance = None
@@ -45,19 +55,26 @@ class AsyncRedisSingleton:
             try:
                 # Creiamo il client se non esiste o se la connessione è persa
                 if not self._pool:
-                   self._pool = redis.ConnectionPool.from_url(
-                        f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}/{settings.REDIS_DB}",
+                    # Pool costruito dai parametri: nessun parsing di URL e dimensione allineata ai worker
+                    self._pool = redis.ConnectionPool(
+                        host=settings.REDIS_HOST,
+                        port=settings.REDIS_PORT,
+                        db=settings.REDIS_DB,
+                        username=settings.REDIS_USER,
                         password=settings.REDIS_PASSWORD,
+                        max_connections=settings.REDIS_MAX_CONNECTIONS,
+                        socket_keepalive=True,
+                        health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL_SECONDS,
                         encoding="utf-8",
                         decode_responses=True
                     )
                 
                 self.client = redis.Redis(connection_pool=self._pool)
                 await self.client.ping()
-                logger.info(f"Connected to Redis at {settings.REDIS_HOST}:{settings.REDIS_PORT}")
+                logger.info("Connected to Redis at %s:%s", settings.REDIS_HOST, settings.REDIS_PORT)
                 return True
             except Exception as e:
-                logger.error(f"Failed to connect to Redis (Attempt {attempt + 1}/{retry_attempts}): {e}")
+                logger.error("Failed to connect to Redis (Attempt %s/%s): %s", attempt + 1, retry_attempts, e)
                 if attempt < retry_attempts - 1:
                     await asyncio.sleep(retry_delay)
         
@@ -88,10 +105,10 @@ class AsyncRedisSingleton:
             await self.client.setex(
                 f"ws_ticket:{ticket_id}",
                 ttl,
-                json.dumps(data)
+                _dumps(data)
             )
         except Exception as e:
-            logger.error(f"Error setting WS ticket {ticket_id}: {e}")
+            logger.error("Error setting WS ticket %s: %s", ticket_id, e)
             raise
 
     async def consume_ws_ticket(self, ticket_id: str) -> Optional[dict]:
@@ -111,29 +128,14 @@ class AsyncRedisSingleton:
         key = f"ws_ticket:{ticket_id}"
         
         try:
-            # Usa transazione WATCH per atomicità (alternativa a Lua per compatibilità test e robustezza)
+            # GET e DEL nella stessa MULTI/EXEC: un solo round-trip e un solo consumatore per ticket
             async with self.client.pipeline(transaction=True) as pipe:
-                try:
-                    await pipe.watch(key)
-                    val = await pipe.get(key)
-                    
-                    if val:
-                        pipe.multi()
-                        await pipe.delete(key)
-                        await pipe.execute()
-                        return json.loads(val)
-                    else:
-                        await pipe.unwatch()
-                        return None
-                except redis.WatchError:
-                    # Race condition: qualcun altro ha toccato la chiave
-                    logger.warning(f"WatchError consuming WS ticket {ticket_id}")
-                    return None
+                pipe.get(key)
+                pipe.delete(key)
+                val, _ = await pipe.execute()
+            return orjson.loads(val) if val else None
         except Exception as e:
-            logger.error(f"Error consuming WS ticket {ticket_id}: {e}")
-            return None
-            print(f"DEBUG: Exception in consume_ws_ticket: {e}")
-            logger.error(f"Error consuming WS ticket {ticket_id}: {e}")
+            logger.error("Error consuming WS ticket %s: %s", ticket_id, e)
             return None
 
     async def set_session(self, user_id: str, session_id: str, data: dict, ttl: int = 86400):
@@ -147,14 +149,14 @@ class AsyncRedisSingleton:
         try:
             async with self.client.pipeline() as pipe:
                 # 1. Salva la sessione
-                pipe.setex(f"session:{session_id}", ttl, json.dumps(data))
+                pipe.setex(f"session:{session_id}", ttl, _dumps(data))
                 # 2. Aggiungi session_id al set dell'utente
                 pipe.sadd(f"user_sessions:{user_id}", session_id)
                 # 3. Imposta scadenza sul set (rinnova ogni volta che si aggiunge)
                 pipe.expire(f"user_sessions:{user_id}", ttl)
                 await pipe.execute()
         except Exception as e:
-            logger.error(f"Error setting session {session_id}: {e}")
+            logger.error("Error setting session %s: %s", session_id, e)
 
     async def revoke_user_sessions(self, user_id: str):
         """
@@ -163,19 +165,153 @@ class AsyncRedisSingleton:
         if not self.client: return
 
         try:
-            # 1. Recupera tutte le sessioni dell'utente
+            # 0. I token emessi fino ad ora non vengono più accettati, nemmeno se verificati localmente
+            await self.client.setex(f"revoked_user:{user_id}", _REVOCATION_TTL_SECONDS, time.time())
+
+            # 1. Recupera tutte le sessioni dell'utente e i payload dei suoi token in cache
             session_ids = await self.client.smembers(f"user_sessions:{user_id}")
-            if not session_ids:
+            token_hashes = await self.client.smembers(f"user_token_payloads:{user_id}")
+            if not session_ids and not token_hashes:
                 return
 
-            # 2. Cancella tutte le sessioni e il set stesso
+            # 2. Cancella sessioni, payload in cache e i set stessi
             keys_to_delete = [f"session:{sid}" for sid in session_ids]
-            keys_to_delete.append(f"user_sessions:{user_id}")
-            
+            keys_to_delete += [f"token_payload:{token_hash}" for token_hash in token_hashes]
+            keys_to_delete += [f"user_sessions:{user_id}", f"user_token_payloads:{user_id}"]
+
+            await self.client.delete(*keys_to_delete)
+            logger.info("Revoked %s sessions for user %s", len(session_ids), user_id)
+        except Exception as e:
+            logger.error("Error revoking sessions for user %s: %s", user_id, e)
+
+    async def revoke_session(self, session_id: Any):
+        """Segna la sessione come revocata (logout, sessione bloccata): i suoi token non vengono più accettati."""
+        if not self.client: return
+
+        try:
+            await self.client.setex(f"revoked_session:{session_id}", _REVOCATION_TTL_SECONDS, 1)
+        except Exception as e:
+            logger.error("Error revoking session %s: %s", session_id, e)
+
+    async def is_token_revoked(self, session_id: Any, user_id: Any, issued_at: Any = None) -> Optional[bool]:
+        """
+        Controlla se il token appartiene a una sessione revocata o a un utente revocato dopo la sua emissione.
+
+        Args:
+            session_id: Sessione del token.
+            user_id: Utente del token.
+            issued_at: Claim iat del token; se manca, una revoca dell'utente vale per il token.
+
+        Returns:
+            True/False, None se Redis non è disponibile (stato sconosciuto).
+        """
+        if not self.client: return None
+
+        try:
+            session_revoked, user_revoked_at = await self.client.mget(
+                f"revoked_session:{session_id}", f"revoked_user:{user_id}")
+        except Exception as e:
+            logger.error("Error reading token revocation: %s", e)
+            return None
+        if session_revoked is not None:
+            return True
+        if user_revoked_at is None:
+            return False
+        return not isinstance(issued_at, (int, float)) or issued_at <= float(user_revoked_at)
+
+    async def get_token_payload(self, token_hash: str) -> Optional[dict]:
+        """
+        Recupera il payload di un token già verificato (cache condivisa tra i worker).
+
+        Args:
+            token_hash: Hash del token, il token in chiaro non viene mai salvato.
+
+        Returns:
+            {"payload": ..., "expires_at": ...} se presente, None altrimenti.
+        """
+        if not self.client: return None
+
+        try:
+            val = await self.client.get(f"token_payload:{token_hash}")
+            return orjson.loads(val) if val is not None else None
+        except Exception as e:
+            logger.error("Error reading cached token payload: %s", e)
+            return None
+
+    async def set_token_payload(self, token_hash: str, data: dict, ttl: int, user_id: Optional[Any] = None):
+        """Salva il payload di un token verificato con scadenza.
+        Se user_id è indicato, il token viene tracciato per utente così che revoke_user_sessions possa rimuoverlo."""
+        if not self.client: return
+
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                pipe.setex(f"token_payload:{token_hash}", ttl, _dumps(data))
+                if user_id is not None:
+                    pipe.sadd(f"user_token_payloads:{user_id}", token_hash)
+                    # Nessun payload resta in cache oltre TOKEN_CACHE_TTL_SECONDS: il set non serve più a lungo
+                    pipe.expire(f"user_token_payloads:{user_id}", settings.TOKEN_CACHE_TTL_SECONDS)
+                await pipe.execute()
+        except Exception as e:
+            logger.error("Error caching token payload: %s", e)
+
+    async def delete_token_payload(self, *token_hashes: str):
+        """Rimuove i payload dei token dalla cache condivisa (es. al logout), con un solo DEL."""
+        if not self.client or not token_hashes: return
+
+        try:
+            await self.client.delete(*(f"token_payload:{token_hash}" for token_hash in token_hashes))
+        except Exception as e:
+            logger.error("Error deleting cached token payload: %s", e)
+
+    async def get_cached_response(self, namespace: str, key: str) -> Optional[Any]:
+        """
+        Recupera una risposta in cache.
+
+        Args:
+            namespace: Gruppo della risposta (es. "citta"), usato per l'invalidazione.
+            key: Chiave della risposta all'interno del gruppo.
+
+        Returns:
+            Il JSON decodificato se presente, None altrimenti.
+        """
+        if not self.client: return None
+
+        try:
+            val = await self.client.get(f"cache:{namespace}:{key}")
+            return orjson.loads(val) if val is not None else None
+        except Exception as e:
+            logger.error("Error reading cached response %s:%s: %s", namespace, key, e)
+            return None
+
+    async def set_cached_response(self, namespace: str, key: str, data: Any, ttl: int = 60):
+        """
+        Salva una risposta in cache.
+        Come per le sessioni, le chiavi del gruppo sono tracciate in un set (KEYS è disabilitato).
+        """
+        if not self.client: return
+
+        try:
+            async with self.client.pipeline() as pipe:
+                pipe.setex(f"cache:{namespace}:{key}", ttl, _dumps(data))
+                pipe.sadd(f"cache_keys:{namespace}", key)
+                pipe.expire(f"cache_keys:{namespace}", ttl)
+                await pipe.execute()
+        except Exception as e:
+            logger.error("Error caching response %s:%s: %s", namespace, key, e)
+
+    async def invalidate_cached_responses(self, namespace: str):
+        """
+        Invalida tutte le risposte in cache di un gruppo (es. dopo una scrittura).
+        """
+        if not self.client: return
+
+        try:
+            keys = await self.client.smembers(f"cache_keys:{namespace}")
+            keys_to_delete = [f"cache:{namespace}:{k}" for k in keys]
+            keys_to_delete.append(f"cache_keys:{namespace}")
             await self.client.delete(*keys_to_delete)
-            logger.info(f"Revoked {len(session_ids)} sessions for user {user_id}")
         except Exception as e:
-            logger.error(f"Error revoking sessions for user {user_id}: {e}")
+            logger.error("Error invalidating cached responses for %s: %s", namespace, e)
 
     async def health_check(self) -> bool:
         if not self.client: return False
@@ -0,0 +1,179 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+from app.core.config import settings
+from app.services.redis_service import AsyncRedisSingleton
+
+T = TypeVar("T")
+
+# Cache delle GET verso i microservizi su due livelli: L1 in-process con TTL di pochi secondi
+# davanti alla cache condivisa su Redis. Le pagine più richieste non pagano né il round-trip
+# verso Redis né la decodifica del JSON; le scritture svuotano il namespace su entrambi i livelli
+# (negli altri worker l'L1 scade al più dopo RESPONSE_LOCAL_CACHE_TTL_SECONDS).
+# Ogni servizio (citta, indirizzi, materie, school) usa un proprio CACHE_NAMESPACE, invalidato a ogni scrittura.
+# In cache finisce il JSON del servizio così com'è: lo valida una sola volta il response_model della route
+# (un modello Pydantic verrebbe riconvertito in dict e rivalidato).
+_LOCAL_CACHE: dict[tuple[str, str], tuple[Any, float]] = {}
+_LOCAL_CACHE_MAX_SIZE = 1_024
+# Caricamenti in corso: le richieste concorrenti per la stessa chiave attendono la stessa future
+_INFLIGHT: dict[tuple[str, str], asyncio.Future] = {}
+# Generazione di ogni namespace, incrementata a ogni invalidazione: un caricamento iniziato prima
+# di una scrittura non rimette in cache il payload ormai vecchio
+_GENERATIONS: dict[str, int] = {}
+
+
+def _get_local(namespace: str, key: str) -> Any | None:
+    entry = _LOCAL_CACHE.get((namespace, key))
+    if entry is None:
+        return None
+    value, expires_at = entry
+    if expires_at <= time.monotonic():
+        _LOCAL_CACHE.pop((namespace, key), None)
+        return None
+    return value
+
+
+def _set_local(namespace: str, key: str, value: Any) -> None:
+    ttl = settings.RESPONSE_LOCAL_CACHE_TTL_SECONDS
+    if ttl <= 0:
+        return
+    now = time.monotonic()
+    if len(_LOCAL_CACHE) >= _LOCAL_CACHE_MAX_SIZE:
+        for cache_key, (_, expires_at) in list(_LOCAL_CACHE.items()):
+            if expires_at <= now:
+                del _LOCAL_CACHE[cache_key]
+        if len(_LOCAL_CACHE) >= _LOCAL_CACHE_MAX_SIZE:
+            # Scarto la voce più vecchia (i dict mantengono l'ordine di inserimento)
+            del _LOCAL_CACHE[next(iter(_LOCAL_CACHE))]
+    _LOCAL_CACHE[(namespace, key)] = (value, now + ttl)
+
+
+async def get_cached_response(namespace: str, key: str) -> Any | None:
+    """
+    Legge una risposta in cache, prima in-process e poi su Redis.
+
+    Args:
+        namespace (str): Gruppo di risposte (es. "materie").
+        key (str): Chiave della risposta all'interno del gruppo.
+
+    Returns:
+        Any | None: La risposta salvata, None se assente o scaduta.
+    """
+    value = _get_local(namespace, key)
+    if value is not None:
+        return value
+    generation = _GENERATIONS.get(namespace, 0)
+    value = await AsyncRedisSingleton().get_cached_response(namespace, key)
+    if value is not None and _GENERATIONS.get(namespace, 0) == generation:
+        _set_local(namespace, key, value)
+    return value
+
+
+async def set_cached_response(namespace: str, key: str, value: Any, ttl: int) -> None:
+    """
+    Salva una risposta su entrambi i livelli di cache.
+
+    Args:
+        namespace (str): Gruppo di risposte.
+        key (str): Chiave della risposta all'interno del gruppo.
+        value (Any): Risposta JSON-serializzabile.
+        ttl (int): Durata in secondi su Redis.
+    """
+    _set_local(namespace, key, value)
+    await AsyncRedisSingleton().set_cached_response(namespace, key, value, ttl)
+
+
+async def invalidate_cached_responses(namespace: str) -> None:
+    """
+    Invalida tutte le risposte di un gruppo, in-process e su Redis.
+
+    Args:
+        namespace (str): Gruppo di risposte da invalidare.
+    """
+    _bump_generation(namespace)
+    for cache_key in [k for k in _LOCAL_CACHE if k[0] == namespace]:
+        _LOCAL_CACHE.pop(cache_key, None)
+    await AsyncRedisSingleton().invalidate_cached_responses(namespace)
+    # Anche i caricamenti partiti durante la cancellazione su Redis possono aver letto il valore vecchio
+    _bump_generation(namespace)
+
+
+def _bump_generation(namespace: str) -> None:
+    _GENERATIONS[namespace] = _GENERATIONS.get(namespace, 0) + 1
+
+
+async def _load(namespace: str, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    generation = _GENERATIONS.get(namespace, 0)
+    value = await get_cached_response(namespace, key)
+    if value is None:
+        value = await fetch()
+        # Invalidazione arrivata durante il fetch: la risposta può precedere la scrittura, non va in cache
+        if _GENERATIONS.get(namespace, 0) == generation:
+            await set_cached_response(namespace, key, value, settings.RESPONSE_CACHE_TTL_SECONDS)
+    return value
+
+
+async def single_flight(inflight: dict[Hashable, asyncio.Future], key: Hashable,
+                        load: Callable[[], Awaitable[T]]) -> T:
+    """
+    Esegue load una sola volta per chiave anche con più chiamate concorrenti (single-flight).
+
+    La prima chiamata registra una future in inflight ed esegue load; le chiamate concorrenti con la stessa
+    chiave attendono il suo risultato (o la sua eccezione). Se il caricamento condiviso viene annullato,
+    chi era in attesa riprova in autonomia.
+
+    Args:
+        inflight (dict[Hashable, asyncio.Future]): Caricamenti in corso, uno per chiave.
+        key (Hashable): Chiave del caricamento.
+        load (Callable[[], Awaitable[T]]): Coroutine da eseguire.
+
+    Returns:
+        T: Il risultato di load.
+    """
+    fut = inflight.get(key)
+    if fut is not None:
+        try:
+            # shield: la cancellazione di un chiamante non deve cancellare il caricamento condiviso
+            return await asyncio.shield(fut)
+        except asyncio.CancelledError:
+            if not fut.cancelled():
+                raise
+            return await load()
+
+    fut = asyncio.get_running_loop().create_future()
+    inflight[key] = fut
+    try:
+        value = await load()
+        fut.set_result(value)
+        return value
+    except asyncio.CancelledError:
+        fut.cancel()
+        raise
+    except BaseException as e:
+        fut.set_exception(e)
+        fut.exception()  # Evita il warning "exception was never retrieved" se nessuno attende
+        raise
+    finally:
+        inflight.pop(key, None)
+
+
+async def get_or_fetch(namespace: str, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """
+    Restituisce la risposta in cache o la carica con fetch, una sola volta per chiave (single-flight).
+
+    Alla scadenza di una voce molto richiesta solo la prima richiesta interroga Redis e il microservizio;
+    le richieste concorrenti per la stessa chiave attendono il suo risultato (o la sua eccezione).
+
+    Args:
+        namespace (str): Gruppo di risposte.
+        key (str): Chiave della risposta all'interno del gruppo.
+        fetch (Callable[[], Awaitable[Any]]): Coroutine che interroga il microservizio in caso di miss.
+
+    Returns:
+        Any: La risposta, dalla cache o appena caricata.
+    """
+    value = _get_local(namespace, key)
+    if value is not None:
+        return value
+    return await single_flight(_INFLIGHT, (namespace, key), lambda: _load(namespace, key, fetch))
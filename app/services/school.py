@@ -1,11 +1,15 @@
+import json
 from typing import Optional
 
 from app.core.logging import get_logger
-from app.schemas.school import SchoolsList, SchoolCreate, SchoolResponse
+from app.schemas.school import SchoolCreate
 from app.services.http_client import OrientatiException, HttpMethod, HttpUrl, HttpParams, send_request
+from app.services import response_cache
 
 logger = get_logger(__name__)
 
+CACHE_NAMESPACE = "schools"
+
 
 async def get_schools(
         limit: int = 10,
@@ -17,7 +21,7 @@ async def get_schools(
         indirizzo: Optional[str] = None,
         sort_by: str = "name",
         order: str = "asc"
-) -> SchoolsList:
+) -> dict:
     """
     Recupera la lista delle scuole con opzioni di paginazione e filtro.
 
@@ -33,7 +37,7 @@ async def get_schools(
         order (str): Ordine: 'asc' o 'desc'.
 
     Returns:
-        SchoolsList: Lista delle scuole con metadati di paginazione.
+        dict: Lista delle scuole con metadati di paginazione.
     """
     try:
         params = {
@@ -50,16 +54,20 @@ async def get_schools(
         # Rimuovo i parametri None
         params = {k: v for k, v in params.items() if v is not None}
 
-        response, status_code = await send_request(
-            method=HttpMethod.GET,
-            url=HttpUrl.SCHOOLS_SERVICE,
-            endpoint="/schools",
-            _params=HttpParams(params)
-        )
-        if status_code >= 400:
-            raise OrientatiException(message=response.get("message", "Error getting schools"), status_code=status_code, details=response)
+        cache_key = f"list:{json.dumps(params, sort_keys=True)}"
 
-        return SchoolsList(**response)
+        async def fetch():
+            response, status_code = await send_request(
+                method=HttpMethod.GET,
+                url=HttpUrl.SCHOOLS_SERVICE,
+                endpoint="/schools",
+                _params=HttpParams(params)
+            )
+            if status_code >= 400:
+                raise OrientatiException(message=response.get("message", "Error getting schools"), status_code=status_code, details=response)
+            return response
+
+        return await response_cache.get_or_fetch(CACHE_NAMESPACE, cache_key, fetch)
 
     except OrientatiException as e:
         raise e
@@ -78,15 +86,19 @@ async def get_school_by_id(school_id: int):
         dict: Dettagli della scuola.
     """
     try:
-        response, status_code = await send_request(
-            method=HttpMethod.GET,
-            url=HttpUrl.SCHOOLS_SERVICE,
-            endpoint=f"/schools/{school_id}"
-        )
-        if status_code >= 400:
-            raise OrientatiException(message=response.get("message", "Error getting school"), status_code=status_code, details=response)
+        cache_key = f"id:{school_id}"
 
-        return response
+        async def fetch():
+            response, status_code = await send_request(
+                method=HttpMethod.GET,
+                url=HttpUrl.SCHOOLS_SERVICE,
+                endpoint=f"/schools/{school_id}"
+            )
+            if status_code >= 400:
+                raise OrientatiException(message=response.get("message", "Error getting school"), status_code=status_code, details=response)
+            return response
+
+        return await response_cache.get_or_fetch(CACHE_NAMESPACE, cache_key, fetch)
 
     except OrientatiException as e:
         raise e
@@ -94,7 +106,7 @@ async def get_school_by_id(school_id: int):
         raise OrientatiException(url="/auth/register", exc=e)
 
 
-async def create_school(school: SchoolCreate) -> SchoolResponse:
+async def create_school(school: SchoolCreate) -> dict:
     """
     Crea una nuova scuola.
 
@@ -115,8 +127,9 @@ async def create_school(school: SchoolCreate) -> SchoolResponse:
         )
         if status_code >= 400:
             raise OrientatiException(message=response.get("message", "Error creating school"), status_code=status_code, details=response)
+        await response_cache.invalidate_cached_responses(CACHE_NAMESPACE)
 
-        return SchoolResponse(**response)
+        return response
 
     except OrientatiException as e:
         raise e
@@ -124,7 +137,7 @@ async def create_school(school: SchoolCreate) -> SchoolResponse:
         raise OrientatiException(url="/auth/register", exc=e)
 
 
-async def update_school(school_id, school) -> SchoolResponse:
+async def update_school(school_id, school) -> dict:
     """
     Aggiorna i dettagli di una scuola esistente.
 
@@ -146,8 +159,9 @@ async def update_school(school_id, school) -> SchoolResponse:
         )
         if status_code >= 400:
             raise OrientatiException(message=response.get("message", "Error updating school"), status_code=status_code, details=response)
+        await response_cache.invalidate_cached_responses(CACHE_NAMESPACE)
 
-        return SchoolResponse(**response)
+        return response
 
     except OrientatiException as e:
         raise e
@@ -173,6 +187,7 @@ async def delete_school(school_id):
         )
         if status_code >= 400:
             raise OrientatiException(message=response.get("message", "Error deleting school"), status_code=status_code, details=response)
+        await response_cache.invalidate_cached_responses(CACHE_NAMESPACE)
         return response
     except OrientatiException as e:
         raise e
@@ -1,33 +1,38 @@
+import asyncio
 import json
 from datetime import datetime
 
-from passlib.context import CryptContext
-
 from app.core.logging import get_logger
-from sqlalchemy import select
-from app.db.session import get_db, AsyncSessionLocal
+from sqlalchemy import select, update
+from app.db.session import AsyncSessionLocal
 from app.models.session import Session
 from app.models.user import User
 from app.schemas.users import ChangePasswordReq, UpdateUserRequest, UpdateUserResponse, \
     DeleteUserResponse
-from app.services.auth import get_session_id_from_token
 from app.services.http_client import OrientatiException, HttpMethod, HttpUrl, HttpParams, send_request
+from app.services import response_cache
+from app.services.auth import hash_password_async
 from sqlalchemy.ext.asyncio import AsyncSession
 
 
 logger = get_logger(__name__)
 
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
-
 RABBIT_DELETE_TYPE = "DELETE"
 RABBIT_UPDATE_TYPE = "UPDATE"
 RABBIT_CREATE_TYPE = "CREATE"
 
 
+def _email_status_namespace(user_id: int) -> str:
+    return f"email_status:{user_id}"
+
+
 async def change_password(passwords: ChangePasswordReq, user_id: int) -> bool:
     try:
-        old_password_hashed = pwd_context.hash(passwords.old_password)
-        new_password_hashed = pwd_context.hash(passwords.new_password)
+        # Hash argon2 in thread separati per non bloccare l'event loop
+        old_password_hashed, new_password_hashed = await asyncio.gather(
+            hash_password_async(passwords.old_password),
+            hash_password_async(passwords.new_password),
+        )
         params = HttpParams()
         params.add_param("user_id", user_id)
         params.add_param("old_password", old_password_hashed)
@@ -97,13 +102,22 @@ async def update_from_rabbitMQ(message):
                 msg_type = json_response["type"]
                 data = json_response["data"]
 
-                logger.info(f"Received message from RabbitMQ: {msg_type} - {data}")
+                logger.info("Received message from RabbitMQ: %s - %s", msg_type, data)
 
-                result = await db.execute(select(User).filter(User.id == data["id"]))
-                user = result.scalars().first()
-                
                 if msg_type == RABBIT_UPDATE_TYPE:
-                    if user is None:
+                    # Un solo UPDATE ... RETURNING: niente SELECT preventiva per caricare l'utente
+                    result = await db.execute(
+                        update(User)
+                        .where(User.id == data["id"])
+                        .values(
+                            email=data["email"],
+                            email_verified=data["email_verified"],
+                            hashed_password=data["hashed_password"],
+                            updated_at=datetime.fromisoformat(data["updated_at"])
+                        )
+                        .returning(User.id)
+                    )
+                    if result.scalar_one_or_none() is None:
                         user = User(
                             id=data["id"],
                             email=data["email"],
@@ -114,29 +128,28 @@ async def update_from_rabbitMQ(message):
                         )
                         db.add(user)
                         await db.commit()
-                        logger.warning(f"User with id {data['id']} not found during update. Created new user.")
+                        logger.warning("User with id %s not found during update. Created new user.", data['id'])
                         return
-                    user.email = data["email"]
-                    user.email_verified = data["email_verified"]
-                    user.name = data["name"]
-                    user.surname = data["surname"]
-                    user.hashed_password = data["hashed_password"]
-                    user.updated_at = datetime.fromisoformat(data["updated_at"])
                     await db.commit()
+                    await response_cache.invalidate_cached_responses(_email_status_namespace(data["id"]))
 
                 elif msg_type == RABBIT_DELETE_TYPE:
+                    # Delete via ORM: serve il cascade sulle sessioni dell'utente
+                    result = await db.execute(select(User).filter(User.id == data["id"]))
+                    user = result.scalars().first()
                     if user:
                         await db.delete(user)
                         await db.commit()
+                        await response_cache.invalidate_cached_responses(_email_status_namespace(data["id"]))
                     else:
-                        logger.error(f"User with id {data['id']} not found during delete.")
+                        logger.error("User with id %s not found during delete.", data['id'])
 
                 elif msg_type == RABBIT_CREATE_TYPE:
                     # Verifica se esiste già
                     result = await db.execute(select(User).filter(User.id == data["id"]))
                     user_exist = result.scalars().first()
                     if user_exist:
-                        logger.warning(f"User with id {data['id']} already exists. Skipping creation.")
+                        logger.warning("User with id %s already exists. Skipping creation.", data['id'])
                     else:
                         user = User(
                             id=data["id"],
@@ -148,38 +161,43 @@ async def update_from_rabbitMQ(message):
                         )
                         db.add(user)
                         await db.commit()
-                        logger.info(f"User with id {data['id']} created via RabbitMQ.")
+                        logger.info("User with id %s created via RabbitMQ.", data['id'])
                 else:
-                    logger.error(f"Unsupported message type: {msg_type}")
+                    logger.error("Unsupported message type: %s", msg_type)
         except Exception as e:
             raise OrientatiException(exc=e, url="users/update_from_rabbitMQ")
 
 
-async def get_email_status_from_token(token: str, db: AsyncSession):
+async def get_email_status(user_id: int, session_id: int, db: AsyncSession) -> bool:
     try:
-        session_id = await get_session_id_from_token(token)
-        # db passato come argomento
-        result = await db.execute(select(Session).filter(Session.id == session_id))
-        session = result.scalars().first()
-        if not session:
-            raise OrientatiException(
-                status_code=404,
-                message="Not Found",
-                details={"message": "Session not found"},
-                url="users/get_email_status_from_token"
-            )
-        
-        result_user = await db.execute(select(User).filter(User.id == session.user_id))
-        user = result_user.scalars().first()
-        
-        if not user:
-            raise OrientatiException(
-                status_code=404,
-                message="Not Found",
-                details={"message": "User not found"},
-                url="users/get_email_status_from_token"
+        async def fetch():
+            # session_id proviene dal payload già validato da validate_token.
+            # Una sola query: l'outer join distingue comunque sessione mancante e utente mancante
+            result = await db.execute(
+                select(Session.id, User.email_verified)
+                .outerjoin(User, User.id == Session.user_id)
+                .where(Session.id == session_id)
             )
-        return user.email_verified
+            row = result.first()
+            if row is None:
+                raise OrientatiException(
+                    status_code=404,
+                    message="Not Found",
+                    details={"message": "Session not found"},
+                    url="users/get_email_status"
+                )
+
+            if row.email_verified is None:
+                raise OrientatiException(
+                    status_code=404,
+                    message="Not Found",
+                    details={"message": "User not found"},
+                    url="users/get_email_status"
+                )
+            return row.email_verified
+
+        # Cache per utente: update_from_rabbitMQ invalida il gruppo quando cambia email_verified
+        return await response_cache.get_or_fetch(_email_status_namespace(user_id), f"session:{session_id}", fetch)
     except Exception as e:
         raise e
 
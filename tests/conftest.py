@@ -4,6 +4,10 @@ from typing import AsyncGenerator
 from httpx import AsyncClient, ASGITransport
 from unittest.mock import MagicMock, AsyncMock, patch
 import sys
+import os
+
+# Usa lo storage in memoria per il rate limiter (vedi app/core/limiter.py)
+os.environ.setdefault("GATEWAY_ENVIRONMENT", "testing")
 
 # Simpler approach: Mock at module import time before app loads
 # This prevents the lifespan from actually connecting to external services
@@ -11,11 +15,25 @@ import sys
 # Mock the external service modules
 sys.modules['app.services.broker'] = MagicMock()
 sys.modules['app.services.redis_service'] = MagicMock()
+# Redis "vuoto": le letture dalla cache condivisa restituiscono sempre un miss
+sys.modules['app.services.redis_service'].AsyncRedisSingleton.return_value = AsyncMock(**{
+    "get_token_payload.return_value": None,
+    "get_cached_response.return_value": None,
+    "is_token_revoked.return_value": False,
+})
 
 @pytest.fixture(scope="session")
 def anyio_backend():
     return "asyncio"
 
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    # Evita che i payload verificati in un test vengano riusati da quello successivo
+    from app.api import deps
+    deps._TOKEN_CACHE.clear()
+    yield
+    deps._TOKEN_CACHE.clear()
+
 @pytest.fixture
 async def client() -> AsyncGenerator[AsyncClient, None]:
     # Import app after mocks are in place
@@ -0,0 +1,56 @@
+import pytest
+from unittest.mock import patch, AsyncMock
+from fastapi import status
+
+
+@pytest.mark.anyio
+async def test_batch_dispatches_sub_requests_in_order(client):
+    """
+    Test that sub-requests are dispatched in-process and returned in request order,
+    each going through the target route's own authentication.
+    """
+    response = await client.post("/api/v1/batch/", json={"requests": [
+        {"id": "root", "url": "/"},
+        {"id": "email", "url": "/api/v1/users/email_status"},
+    ]})
+
+    assert response.status_code == status.HTTP_200_OK
+    responses = response.json()["responses"]
+    assert [r["id"] for r in responses] == ["root", "email"]
+    assert responses[0]["status"] == status.HTTP_200_OK
+    assert responses[0]["body"]["status"] == "operational"
+    assert responses[1]["status"] == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.anyio
+async def test_batch_rejects_external_and_nested_urls(client):
+    """
+    Test that only gateway-relative, non-batch paths are accepted.
+    """
+    for url in ("https://example.com/", "//example.com/", "/api/v1/batch/", "/api/v1/%62atch/",
+                "/api/v1//batch", "/api/v1/users/../batch/?x=1"):
+        response = await client.post("/api/v1/batch/", json={"requests": [{"id": "x", "url": url}]})
+        assert response.status_code == status.HTTP_422_UNPROCESSABLE_ENTITY
+
+
+@pytest.mark.anyio
+async def test_batch_isolates_failing_sub_request(client):
+    """
+    Test that an unhandled error in one sub-request becomes a per-item 500
+    while the other sub-responses are still returned.
+    """
+    with patch("app.services.auth.verify_token", new_callable=AsyncMock) as mock_verify, \
+            patch("app.services.users.get_email_status", new_callable=AsyncMock) as mock_status:
+        mock_verify.return_value = {"verified": True, "expired": False, "user_id": 1, "session_id": 1}
+        mock_status.side_effect = RuntimeError("boom")
+
+        response = await client.post("/api/v1/batch/", json={"requests": [
+            {"id": "root", "url": "/"},
+            {"id": "email", "url": "/api/v1/users/email_status"},
+        ]}, headers={"Authorization": "Bearer token"})
+
+    assert response.status_code == status.HTTP_200_OK
+    responses = response.json()["responses"]
+    assert responses[0]["status"] == status.HTTP_200_OK
+    assert responses[0]["body"]["status"] == "operational"
+    assert responses[1]["status"] == status.HTTP_500_INTERNAL_SERVER_ERROR
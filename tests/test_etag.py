@@ -0,0 +1,24 @@
+import pytest
+from unittest.mock import patch, AsyncMock
+from fastapi import status
+
+
+@pytest.mark.anyio
+async def test_materia_detail_revalidates_with_etag(client):
+    """
+    Test that detail responses carry an ETag and a matching If-None-Match gets an empty 304.
+    """
+    materia = {"id": 1, "nome": "Matematica", "descrizione": None}
+    with patch("app.services.materie.get_materia_by_id", new_callable=AsyncMock, return_value=materia):
+        first = await client.get("/api/v1/materie/1")
+        assert first.status_code == status.HTTP_200_OK
+        assert first.json() == materia
+        etag = first.headers["ETag"]
+
+        second = await client.get("/api/v1/materie/1", headers={"If-None-Match": etag})
+        assert second.status_code == status.HTTP_304_NOT_MODIFIED
+        assert second.content == b""
+        assert second.headers["ETag"] == etag
+
+        changed = await client.get("/api/v1/materie/1", headers={"If-None-Match": '"stale"'})
+        assert changed.status_code == status.HTTP_200_OK
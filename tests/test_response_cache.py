@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from app.services import response_cache
+from app.services.redis_service import AsyncRedisSingleton
+
+
+@pytest.fixture(autouse=True)
+def clear_local_cache():
+    response_cache._LOCAL_CACHE.clear()
+    yield
+    response_cache._LOCAL_CACHE.clear()
+
+
+@pytest.mark.anyio
+async def test_local_hit_skips_redis():
+    """
+    Test that a response stored by this worker is served in-process without reading Redis.
+    """
+    redis = AsyncRedisSingleton()
+    redis.get_cached_response.reset_mock()
+
+    await response_cache.set_cached_response("materie", "id:1", {"id": 1}, 60)
+    assert await response_cache.get_cached_response("materie", "id:1") == {"id": 1}
+    redis.get_cached_response.assert_not_awaited()
+
+
+@pytest.mark.anyio
+async def test_invalidation_clears_only_the_namespace():
+    """
+    Test that invalidating a namespace drops its local entries and leaves the others.
+    """
+    await response_cache.set_cached_response("materie", "id:1", {"id": 1}, 60)
+    await response_cache.set_cached_response("citta", "id:1", {"id": 1}, 60)
+
+    await response_cache.invalidate_cached_responses("materie")
+
+    assert ("materie", "id:1") not in response_cache._LOCAL_CACHE
+    assert ("citta", "id:1") in response_cache._LOCAL_CACHE
+    AsyncRedisSingleton().invalidate_cached_responses.assert_awaited_with("materie")
+
+
+@pytest.mark.anyio
+async def test_concurrent_misses_fetch_once():
+    """
+    Test that concurrent misses on the same key share a single upstream call.
+    """
+    calls = 0
+    release = asyncio.Event()
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return {"id": 42}
+
+    tasks = [asyncio.create_task(response_cache.get_or_fetch("materie", "id:42", fetch)) for _ in range(10)]
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await asyncio.gather(*tasks) == [{"id": 42}] * 10
+    assert calls == 1
+
+
+@pytest.mark.anyio
+async def test_invalidation_during_fetch_skips_caching():
+    """
+    Test that a load which started before a write does not put its stale response back in cache.
+    """
+    redis = AsyncRedisSingleton()
+    redis.set_cached_response.reset_mock()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return {"id": 7, "name": "old"}
+
+    task = asyncio.create_task(response_cache.get_or_fetch("materie", "id:7", fetch))
+    await asyncio.sleep(0)
+    await response_cache.invalidate_cached_responses("materie")
+    release.set()
+
+    assert await task == {"id": 7, "name": "old"}
+    assert ("materie", "id:7") not in response_cache._LOCAL_CACHE
+    redis.set_cached_response.assert_not_awaited()
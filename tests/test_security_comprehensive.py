@@ -1,6 +1,9 @@
 
+import time
+from collections import deque
+
 import pytest
-from unittest.mock import patch, AsyncMock
+from unittest.mock import patch, AsyncMock, MagicMock
 from app.services.http_client import OrientatiException
 from fastapi import status
 
@@ -55,3 +58,103 @@ async def test_verify_token_generic_error_fail_secure(client):
         assert response.status_code == status.HTTP_401_UNAUTHORIZED
         # Must match the generic message in deps.py
         assert response.json()["detail"] == "Could not validate credentials"
+
+@pytest.mark.anyio
+async def test_protected_router_requires_token(client):
+    """
+    Test that write operations on router-level protected routes require a bearer token.
+    """
+    response = await client.post("/api/v1/citta/", json={"nome": "Torino"})
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = await client.delete("/api/v1/indirizzi/1")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+@pytest.mark.anyio
+async def test_orientati_exception_mapped_by_global_handler(client):
+    """
+    Test that OrientatiException raised by a service is serialized by the global handler.
+    """
+    with patch("app.services.auth.refresh_token", new_callable=AsyncMock) as mock_refresh:
+        mock_refresh.side_effect = OrientatiException(
+            message="Unauthorized",
+            status_code=401,
+            details={"message": "Invalid refresh token"},
+            url="/token/verify"
+        )
+
+        response = await client.post("/api/v1/auth/refresh", json={"token": "refresh"})
+
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert response.json() == {
+            "message": "Unauthorized",
+            "details": {"message": "Invalid refresh token"},
+            "url": "/token/verify"
+        }
+
+@pytest.mark.anyio
+async def test_login_accepts_json_and_form(client):
+    """
+    Test that JSON login and the Swagger form login both reach the auth service.
+    """
+    tokens = {"access_token": "access", "refresh_token": "refresh", "token_type": "Bearer"}
+    with patch("app.services.auth.login", new_callable=AsyncMock) as mock_login:
+        mock_login.return_value = tokens
+
+        response = await client.post("/api/v1/auth/login", json={"email": "user@example.com", "password": "pw"})
+        assert response.status_code == status.HTTP_200_OK
+
+        response = await client.post("/api/v1/auth/login/form", data={"username": "user@example.com", "password": "pw"})
+        assert response.status_code == status.HTTP_200_OK
+
+        assert mock_login.await_count == 2
+
+@pytest.mark.anyio
+async def test_unknown_user_login_waits_without_verifying():
+    """
+    Test that a login for an unknown email waits for the verify budget
+    without running an argon2 verification or holding a thread-pool worker.
+    """
+    from app.services import auth
+    from app.schemas.auth import UserLogin
+
+    db = AsyncMock()
+    db.execute.return_value = MagicMock(**{"first.return_value": None})
+    with patch.object(auth, "_verify_durations", deque([0.05])), \
+            patch.object(auth.pwd_context, "verify") as mock_verify, \
+            patch.object(auth.asyncio, "to_thread") as mock_to_thread:
+        start = time.perf_counter()
+        with pytest.raises(auth.InvalidCredentialsException):
+            await auth.login(UserLogin(email="missing@example.com", password="pw"), db)
+        elapsed = time.perf_counter() - start
+
+    assert elapsed >= 0.05
+    mock_verify.assert_not_called()
+    # L'attesa non occupa thread del pool condiviso con le verifiche reali
+    mock_to_thread.assert_not_called()
+
+@pytest.mark.anyio
+async def test_update_other_user_forbidden_before_body_validation(client):
+    """
+    Test that updating another user is rejected with 403 before the body is validated.
+    """
+    payload = {"verified": True, "expired": False, "user_id": 1, "session_id": 1}
+    with patch("app.services.auth.verify_token", new_callable=AsyncMock, return_value=payload), \
+            patch("app.services.users.update_user", new_callable=AsyncMock) as mock_update:
+        response = await client.patch("/api/v1/users/2", json={"name": ["not", "a", "string"]},
+                                      headers={"Authorization": "Bearer token"})
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert response.json()["details"] == {"message": "You are not allowed to update this user"}
+        mock_update.assert_not_awaited()
+
+@pytest.mark.anyio
+async def test_security_headers_on_error_responses(client):
+    """
+    Test that security headers are added once, also to responses built by exception handlers.
+    """
+    response = await client.get("/api/v1/users/email_status")
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert response.headers.get_list("x-frame-options") == ["DENY"]
+    assert response.headers["x-content-type-options"] == "nosniff"
+    assert "frame-ancestors 'none'" in response.headers["content-security-policy"]
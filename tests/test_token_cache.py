@@ -0,0 +1,225 @@
+import time
+
+import pytest
+from unittest.mock import patch, AsyncMock
+from app.services.http_client import OrientatiException
+from fastapi import HTTPException, status
+
+VALID_PAYLOAD = {"verified": True, "expired": False, "user_id": 1, "session_id": 1}
+
+# --- Token Payload Cache Tests ---
+
+@pytest.mark.anyio
+async def test_verified_token_is_cached(client):
+    """
+    Test that repeated requests with the same bearer verify the token only once.
+    """
+    with patch("app.services.auth.verify_token", new_callable=AsyncMock) as mock_verify, \
+            patch("app.services.users.get_email_status", new_callable=AsyncMock) as mock_status:
+        mock_verify.return_value = dict(VALID_PAYLOAD)
+        mock_status.return_value = True
+
+        for _ in range(3):
+            response = await client.get("/api/v1/users/email_status", headers={"Authorization": "Bearer cached_token"})
+            assert response.status_code == status.HTTP_200_OK
+
+        assert mock_verify.await_count == 1
+
+@pytest.mark.anyio
+async def test_failed_verification_is_not_cached(client):
+    """
+    Test that a rejected token is verified again on the next request.
+    """
+    with patch("app.services.auth.verify_token", new_callable=AsyncMock) as mock_verify:
+        mock_verify.side_effect = OrientatiException(
+            message="Invalid token",
+            status_code=401,
+            details={"message": "Invalid token"},
+            url="/token/verify"
+        )
+
+        for _ in range(2):
+            response = await client.get("/api/v1/users/email_status", headers={"Authorization": "Bearer bad_token"})
+            assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+        assert mock_verify.await_count == 2
+
+@pytest.mark.anyio
+async def test_cache_respects_token_exp(client):
+    """
+    Test that a payload whose JWT is already past its exp claim is never cached.
+    """
+    with patch("app.services.auth.verify_token", new_callable=AsyncMock) as mock_verify, \
+            patch("app.services.users.get_email_status", new_callable=AsyncMock) as mock_status:
+        mock_verify.return_value = {**VALID_PAYLOAD, "exp": time.time() - 1}
+        mock_status.return_value = True
+
+        for _ in range(2):
+            await client.get("/api/v1/users/email_status", headers={"Authorization": "Bearer old_token"})
+
+        assert mock_verify.await_count == 2
+
+@pytest.mark.anyio
+async def test_concurrent_validations_are_coalesced():
+    """
+    Test that concurrent validations of the same token share a single upstream call.
+    """
+    import asyncio
+    from app.api.deps import validate_token
+
+    async def slow_verify(token):
+        await asyncio.sleep(0.05)
+        return dict(VALID_PAYLOAD)
+
+    with patch("app.services.auth.verify_token", new_callable=AsyncMock) as mock_verify:
+        mock_verify.side_effect = slow_verify
+        results = await asyncio.gather(*(validate_token("burst_token") for _ in range(10)))
+
+    assert mock_verify.await_count == 1
+    assert all(r["user_id"] == 1 for r in results)
+
+def test_token_validation_path_is_async():
+    """
+    Test that the token validation chain stays async: a sync dependency would be
+    dispatched by FastAPI to the threadpool on every protected request.
+    """
+    import inspect
+    from app.api.deps import validate_token, reusable_oauth2
+    from app.services import auth
+
+    assert inspect.iscoroutinefunction(validate_token)
+    assert inspect.iscoroutinefunction(reusable_oauth2.__call__)
+    assert inspect.iscoroutinefunction(auth.verify_token)
+
+@pytest.mark.anyio
+async def test_shared_cache_hit_skips_upstream():
+    """
+    Test that a payload cached in Redis by another worker is used without calling the token service.
+    """
+    from app.api import deps
+
+    redis_instance = deps.AsyncRedisSingleton()
+    shared = {"payload": dict(VALID_PAYLOAD), "expires_at": time.time() + 60}
+    with patch.object(redis_instance, "get_token_payload", new_callable=AsyncMock) as mock_shared, \
+            patch("app.services.auth.verify_token", new_callable=AsyncMock) as mock_verify:
+        mock_shared.return_value = shared
+        payload = await deps.validate_token("shared_token")
+
+    assert payload["user_id"] == 1
+    mock_verify.assert_not_awaited()
+    assert deps._get_cached_payload(deps._token_key("shared_token")) is not None
+
+@pytest.mark.anyio
+async def test_locally_verified_jwt_skips_upstream():
+    """
+    Test that an access JWT signed with a key from the cached JWKS, with the expected issuer and audience,
+    is verified without the token service, while other tokens fall back to it and revoked sessions are rejected.
+    """
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+    from jose import jwk, jwt
+    from app.api import deps
+    from app.services import auth
+
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption())
+    public_jwk = jwk.construct(private_key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo), "RS256").to_dict()
+    claims = {"iss": "token-service", "aud": "gateway", "token_use": "access", "exp": int(time.time()) + 60}
+
+    def sign(kid="k1", **extra):
+        return jwt.encode({**claims, **extra}, pem, algorithm="RS256", headers={"kid": kid})
+
+    redis_instance = deps.AsyncRedisSingleton()
+    with patch.object(auth.settings, "TOKEN_JWKS_URL", "http://token/jwks"), \
+            patch.object(auth.settings, "TOKEN_JWT_ISSUER", "token-service"), \
+            patch.object(auth.settings, "TOKEN_JWT_AUDIENCE", "gateway"), \
+            patch.object(auth, "_JWKS", {"k1": public_jwk}), \
+            patch.object(auth, "_JWKS_FETCHED_AT", time.monotonic()), \
+            patch.object(redis_instance, "is_token_revoked", new_callable=AsyncMock) as mock_revoked, \
+            patch("app.services.auth.verify_token", new_callable=AsyncMock) as mock_verify:
+        mock_revoked.return_value = False
+        mock_verify.return_value = {"verified": False}
+
+        payload = await deps.validate_token(sign(user_id=1, session_id=1))
+        assert payload["user_id"] == 1 and payload["verified"]
+        mock_verify.assert_not_awaited()
+
+        # Kid sconosciuto, audience errata o refresh token: decide il servizio token
+        for token in (sign(kid="k2", user_id=2), sign(aud="other", user_id=3),
+                      sign(token_use="refresh", user_id=4)):
+            with pytest.raises(HTTPException):
+                await deps.validate_token(token)
+        assert mock_verify.await_count == 3
+
+        # Sessione revocata (es. logout): rifiutato senza chiamare il servizio token
+        mock_revoked.return_value = True
+        with pytest.raises(HTTPException):
+            await deps.validate_token(sign(user_id=5, session_id=5))
+        assert mock_verify.await_count == 3
+
+@pytest.mark.anyio
+async def test_logout_reuses_cached_payload(client):
+    """
+    Test that logging out with an already validated token does not verify it upstream again.
+    """
+    with patch("app.services.auth.verify_token", new_callable=AsyncMock) as mock_verify, \
+            patch("app.services.users.get_email_status", new_callable=AsyncMock) as mock_status, \
+            patch("app.services.auth.logout", new_callable=AsyncMock) as mock_logout:
+        mock_verify.return_value = dict(VALID_PAYLOAD)
+        mock_status.return_value = True
+        mock_logout.return_value = {}
+
+        await client.get("/api/v1/users/email_status", headers={"Authorization": "Bearer logout_token"})
+        response = await client.post("/api/v1/auth/logout", json={"token": "logout_token"})
+
+        assert response.status_code == status.HTTP_200_OK
+        mock_verify.assert_awaited_once()
+        assert mock_logout.await_args.kwargs["payload"]["session_id"] == 1
+
+@pytest.mark.anyio
+async def test_blocked_session_evicts_cached_access_token(client):
+    """
+    Test that reusing a refresh token blocks the session and evicts its cached access tokens,
+    so the next request with one of them gets a 401.
+    """
+    from datetime import datetime, timedelta
+    from unittest.mock import MagicMock
+    from app.api import deps
+    from app.models.accessToken import AccessToken
+    from app.models.refreshToken import RefreshToken
+    from app.models.session import Session
+    from app.schemas.auth import TokenRequest
+    from app.services import auth
+
+    session = Session(id=1, user_id=1, is_active=True, is_blocked=False,
+                      expires_at=datetime.now() + timedelta(days=1))
+    db = AsyncMock()
+    db.execute.side_effect = [
+        MagicMock(**{"first.return_value": (RefreshToken(is_expired=True), AccessToken(), session)}),
+        MagicMock(**{"scalars.return_value.all.return_value": ["blocked_token"]}),
+        MagicMock(),
+        MagicMock(),
+    ]
+    redis_instance = deps.AsyncRedisSingleton()
+    with patch("app.services.auth.verify_token", new_callable=AsyncMock) as mock_verify, \
+            patch("app.services.users.get_email_status", new_callable=AsyncMock) as mock_status, \
+            patch.object(redis_instance, "is_token_revoked", new_callable=AsyncMock) as mock_revoked:
+        mock_verify.return_value = dict(VALID_PAYLOAD)
+        mock_status.return_value = True
+        mock_revoked.return_value = False
+
+        headers = {"Authorization": "Bearer blocked_token"}
+        response = await client.get("/api/v1/users/email_status", headers=headers)
+        assert response.status_code == status.HTTP_200_OK
+
+        with pytest.raises(auth.InvalidTokenException):
+            await auth.refresh_token(TokenRequest(token="reused_refresh_token"), db)
+        assert session.is_blocked
+        assert deps._get_cached_payload(deps._token_key("blocked_token")) is None
+
+        # Redis ora ha il marker di revoca della sessione
+        mock_revoked.return_value = True
+        response = await client.get("/api/v1/users/email_status", headers=headers)
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED